@@ -0,0 +1,88 @@
+"""
+Cache, por parâmetros de consulta, dos dados já classificados servidos pelos
+endpoints e dos arquivos (CSV, Parquet, Arrow) gerados a partir deles.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from cachetools import TTLCache
+
+from app.core.config import settings
+
+# Consultas idênticas ao mesmo endpoint reutilizam o mesmo resultado
+_RESULT_CACHE = TTLCache(maxsize=512, ttl=settings.CACHE_TTL)
+_RESULT_LOCK = threading.Lock()
+
+# Arquivos já serializados: (conteúdo, media type, cabeçalhos). O tamanho é
+# medido em bytes, limitando a memória total; um arquivo maior que o limite
+# simplesmente não é guardado
+SERIALIZED_CACHE_BYTES = 128 * 1024 * 1024
+SerializedEntry = Tuple[bytes, str, Dict[str, str]]
+_SERIALIZED_CACHE = TTLCache(
+    maxsize=SERIALIZED_CACHE_BYTES,
+    ttl=settings.CACHE_TTL,
+    getsizeof=lambda entry: len(entry[0]),
+)
+
+
+def is_cacheable(result: Dict[str, Any]) -> bool:
+    """
+    Indica se o resultado pode ser guardado.
+
+    Resultados vazios, com erro ou vindos dos arquivos de fallback não são
+    guardados, para que uma falha temporária da fonte não seja servida
+    durante todo o TTL.
+    """
+    return (
+        bool(result.get("data"))
+        and not result.get("error")
+        and not result.get("fallback_used")
+        and result.get("data_source") != "fallback_file"
+    )
+
+
+def cached_result(name: str, compute: Callable[..., Dict[str, Any]], **params: Any) -> Dict[str, Any]:
+    """
+    Devolve ``compute(**params)``, reaproveitando o resultado de uma consulta
+    idêntica ao mesmo endpoint.
+
+    A busca e a classificação ficam dentro de ``compute``; o resultado
+    guardado é compartilhado entre as requisições e a serialização apenas o
+    lê, por isso um acerto devolve uma cópia rasa marcada como vinda do
+    cache. Só são guardados os resultados aceitos por ``is_cacheable``.
+    """
+    key = (name, tuple(sorted(params.items())))
+    with _RESULT_LOCK:
+        cached = _RESULT_CACHE.get(key)
+    if cached is not None:
+        return {**cached, "from_cache": True, "data_source": "cache"}
+
+    result = compute(**params)
+    if not is_cacheable(result):
+        return result
+    with _RESULT_LOCK:
+        _RESULT_CACHE[key] = result
+    return result
+
+
+def get_serialized(key: Hashable) -> Optional[SerializedEntry]:
+    """Devolve o arquivo já serializado para a chave, se houver."""
+    with _RESULT_LOCK:
+        return _SERIALIZED_CACHE.get(key)
+
+
+def set_serialized(key: Hashable, entry: SerializedEntry) -> None:
+    """Guarda um arquivo serializado, descartando-o se exceder o limite."""
+    with _RESULT_LOCK:
+        try:
+            _SERIALIZED_CACHE[key] = entry
+        except ValueError:
+            # Maior que SERIALIZED_CACHE_BYTES
+            pass
+
+
+def clear_result_cache() -> None:
+    """Descarta os resultados e arquivos guardados, por exemplo após atualizar os dados da fonte."""
+    with _RESULT_LOCK:
+        _RESULT_CACHE.clear()
+        _SERIALIZED_CACHE.clear()
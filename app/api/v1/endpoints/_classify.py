@@ -0,0 +1,108 @@
+"""
+Utilitários de classificação por palavras-chave compartilhados pelos endpoints.
+
+Os mapeamentos de palavras-chave são compilados uma única vez, na importação
+do módulo que os declara, em uma expressão regular por rótulo. A
+classificação é feita sobre uma coluna de texto do DataFrame, com os
+kernels de string do pandas, em vez de um laço Python por registro.
+"""
+import re
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Pattern, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Sequência ordenada de (rótulo, expressão compilada)
+KeywordPatterns = Tuple[Tuple[str, Pattern], ...]
+
+
+def essential_keywords(keywords: Iterable[str]) -> FrozenSet[str]:
+    """
+    Reduz uma lista de palavras-chave ao conjunto mínimo equivalente.
+
+    A busca é por substring, então uma palavra que contém outra da mesma
+    lista nunca muda o resultado ("vinho fino" já é coberto por "vinho",
+    "passas" por "passa") e é descartada junto com as duplicatas.
+    """
+    palavras = frozenset(keywords)
+    return frozenset(
+        palavra for palavra in palavras
+        if not any(outra != palavra and outra in palavra for outra in palavras)
+    )
+
+
+def compile_keyword_patterns(mapping: Dict[str, Iterable[str]]) -> KeywordPatterns:
+    """
+    Compila cada lista de palavras-chave em uma alternância de literais.
+
+    A ordem do dicionário é preservada: quando um texto contém palavras de
+    mais de um rótulo, vence o primeiro rótulo declarado, como no laço
+    original com ``any(palavra in texto ...)``.
+    """
+    return tuple(
+        (label, re.compile("|".join(re.escape(keyword) for keyword in sorted(essential_keywords(keywords)))))
+        for label, keywords in mapping.items()
+    )
+
+
+def build_text_column(df: pd.DataFrame, campos: Sequence[str]) -> pd.Series:
+    """
+    Concatena, em minúsculas, os campos preenchidos de cada linha do DataFrame.
+
+    Das várias grafias de um mesmo campo ("Produto", "produto", "Descrição",
+    ...) normalmente só uma existe nos dados; as colunas sem nenhum valor são
+    descartadas antes de qualquer conversão de texto.
+    """
+    text = pd.Series("", index=df.index, dtype=object)
+    for campo in campos:
+        if campo not in df.columns:
+            continue
+        coluna = df[campo]
+        preenchido = coluna.notna()
+        if not preenchido.any():
+            continue
+        preenchido &= coluna.astype(bool)
+        text = text + (coluna.astype(str).str.lower() + " ").where(preenchido, "")
+    return text
+
+
+def classify_text_column(text: pd.Series, patterns: KeywordPatterns,
+                         default: Optional[str] = None) -> np.ndarray:
+    """
+    Retorna, para cada linha, o primeiro rótulo cujas palavras-chave aparecem
+    no texto, ou ``default`` quando nenhum rótulo corresponde.
+
+    Linhas sem texto (nenhum dos campos preenchido) não passam pelas
+    expressões regulares.
+    """
+    resultado = np.full(len(text), default, dtype=object)
+    preenchido = (text != "").to_numpy()
+    if not preenchido.any():
+        return resultado
+    texto = text[preenchido]
+    condicoes = [texto.str.contains(pattern, regex=True, na=False).to_numpy() for _, pattern in patterns]
+    rotulos = [label for label, _ in patterns]
+    resultado[preenchido] = np.select(condicoes, rotulos, default=default)
+    return resultado
+
+
+def all_classified(records: List[Dict[str, Any]], campo: str = "subcategoria") -> bool:
+    """
+    Indica se todos os registros já trazem ``campo``, caso em que a
+    classificação pode ser pulada. A verificação para no primeiro registro
+    sem o campo, o caso comum, e custa uma única consulta ao dicionário.
+    """
+    return all(campo in record for record in records)
+
+
+def classify_records(records: List[Dict[str, Any]], campos: Sequence[str], patterns: KeywordPatterns,
+                     default: Optional[str] = None) -> np.ndarray:
+    """
+    Classifica os registros pelo texto dos ``campos``, na ordem dos registros.
+
+    O DataFrame é montado só com as colunas lidas pelo classificador; os
+    endpoints que precisam de outras colunas (volume, unidade) montam o seu
+    e usam ``build_text_column`` e ``classify_text_column`` diretamente.
+    """
+    df = pd.DataFrame(records, columns=list(campos))
+    return classify_text_column(build_text_column(df, campos), patterns, default=default)
@@ -0,0 +1,311 @@
+"""
+Serialização das respostas de dados em formatos de arquivo, compartilhada
+pelos endpoints.
+"""
+import io
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterator, List, Literal, Optional
+
+import pandas as pd
+# O pyarrow já é carregado pelo pandas; os módulos de CSV e Parquet só são
+# importados na primeira resposta nesses formatos, poupando tempo de
+# inicialização e memória em workers que só servem JSON
+import pyarrow as pa
+from fastapi import HTTPException, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from starlette.status import HTTP_404_NOT_FOUND
+
+from app.api.v1.endpoints._cache import get_serialized, is_cacheable, set_serialized
+from app.schemas.data import DataResponse
+
+# Quantidade máxima de linhas por row group ao transmitir Parquet
+PARQUET_CHUNK_ROWS = 64_000
+# Codec das respostas Parquet: arquivos menores que snappy, com leitura igualmente rápida
+PARQUET_COMPRESSION = "zstd"
+
+# Tipo de mídia do formato de streaming IPC do Arrow
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Formatos de resposta aceitos pelo parâmetro ``format`` dos endpoints
+ResponseFormat = Literal["json", "csv", "parquet", "arrow"]
+# Disposição do JSON: registros em ``data`` ou listas de valores por campo em ``columns``
+JsonLayout = Literal["row", "column"]
+
+# Documentação OpenAPI da resposta de sucesso: o JSON segue ``DataResponse``,
+# sem ser validado a cada requisição, e os formatos de arquivo seus media types
+DATA_RESPONSES: Dict[int, Dict[str, Any]] = {
+    200: {
+        "model": DataResponse,
+        "content": {
+            "text/csv": {},
+            "application/octet-stream": {},
+            ARROW_STREAM_MEDIA_TYPE: {},
+        },
+    },
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Destino de escrita que acumula os bytes produzidos até serem drenados.
+
+    A posição reportada por ``tell`` continua crescendo após cada dreno,
+    pois o escritor Parquet a usa para calcular os offsets do rodapé.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def records_to_table(records: List[Dict[str, Any]]) -> pa.Table:
+    """
+    Constrói a tabela Arrow diretamente da lista de registros, sem o
+    DataFrame intermediário.
+
+    As colunas são a união das chaves na ordem em que aparecem, como no
+    ``pd.DataFrame``; registros sem a chave recebem nulo. Valores NaN também
+    viram nulo (``from_pandas=True``), como em ``pa.Table.from_pandas``.
+    Diferente daquele caminho, colunas inteiras com lacunas permanecem
+    int64 com nulos em vez de serem promovidas a double.
+    """
+    columns = dict.fromkeys(key for record in records for key in record)
+    return pa.table({
+        name: pa.array([record.get(name) for record in records], from_pandas=True)
+        for name in columns
+    })
+
+
+def _pandas_csv(records: List[Dict[str, Any]]) -> bytes:
+    # Caminho anterior, para colunas com tipos misturados; escreve direto em
+    # bytes, sem montar antes o CSV inteiro como str para depois codificá-lo
+    buffer = io.BytesIO()
+    pd.DataFrame(records).to_csv(buffer, index=False, encoding="utf-8")
+    return buffer.getvalue()
+
+
+def iter_csv(table: pa.Table, chunk_rows: int = PARQUET_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    Gera o CSV em partes com o escritor C++ do Arrow: o cabeçalho e, em
+    seguida, um bloco de linhas por record batch.
+    """
+    import pyarrow.csv as pacsv
+
+    sink = _ChunkSink()
+    with pacsv.CSVWriter(sink, table.schema) as writer:
+        yield sink.drain()
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            writer.write_batch(batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+
+
+def records_to_csv(records: List[Dict[str, Any]]) -> bytes:
+    """
+    Serializa os registros em CSV com o escritor C++ do Arrow, já em bytes.
+
+    Colunas com tipos misturados não formam uma coluna Arrow; nesse caso o
+    CSV é gerado pelo caminho anterior, via ``pd.DataFrame.to_csv``.
+    """
+    try:
+        table = records_to_table(records)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return _pandas_csv(records)
+    return b"".join(iter_csv(table))
+
+
+def records_to_columns(records: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """
+    Converte os registros em listas de valores por campo, na ordem dos
+    registros. Como no ``records_to_table``, as colunas são a união das
+    chaves e registros sem a chave recebem None.
+    """
+    columns = dict.fromkeys(key for record in records for key in record)
+    return {name: [record.get(name) for record in records] for name in columns}
+
+
+def iter_parquet(table: pa.Table, chunk_rows: int = PARQUET_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    Gera o arquivo Parquet em partes, um row group por vez, limitando o pico
+    de memória a um row group em vez do arquivo inteiro.
+    """
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, table.schema, compression=PARQUET_COMPRESSION) as writer:
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            writer.write_batch(batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    # Rodapé com os metadados do arquivo
+    yield sink.drain()
+
+
+def parquet_response(table: pa.Table, filename: str) -> StreamingResponse:
+    """
+    Resposta Parquet transmitida em partes.
+
+    O gerador é síncrono, então o Starlette o consome em uma thread do pool
+    e a serialização não bloqueia o event loop.
+
+    Erros de conversão de tipos já ocorreram ao montar a tabela, antes desta
+    chamada, e chegam ao tratamento de erro do endpoint. Uma falha durante a
+    escrita, porém, só aparece depois que o status 200 e os cabeçalhos foram
+    enviados: o cliente recebe um corpo truncado, não a resposta de erro.
+    """
+    return StreamingResponse(
+        iter_parquet(table),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+def iter_arrow_stream(table: pa.Table, chunk_rows: int = PARQUET_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    Gera o stream IPC do Arrow em partes, um record batch por vez.
+
+    Sem codificação nem compressão, a escrita e a leitura são mais rápidas que
+    as do Parquet, ao custo de um corpo maior; adequado para transferências
+    curtas, como notebooks e serviços na mesma rede.
+    """
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            writer.write_batch(batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    # Marcador de fim do stream
+    yield sink.drain()
+
+
+async def _json_format(result: Dict[str, Any], name: str, layout: str = "row") -> ORJSONResponse:
+    # Montado aqui com os campos de DataResponse e serializado direto pelo
+    # orjson; os dados vêm do serviço, então a validação do response_model
+    # apenas percorreria todos os registros mais uma vez
+    payload = {
+        "data": result.get("data", []),
+        "metadata": result.get("metadata", {}),
+        "from_cache": result.get("from_cache", False),
+        "layout": "row",
+        "columns": None,
+    }
+    if layout == "column":
+        payload["columns"] = await run_in_threadpool(records_to_columns, payload["data"])
+        payload["data"] = []
+        payload["layout"] = "column"
+    return ORJSONResponse(payload)
+
+
+async def _csv_format(result: Dict[str, Any], name: str, layout: str = "row") -> Response:
+    if not result.get("data"):
+        return Response(content="", media_type="text/csv")
+    # A montagem da tabela roda no pool de threads; a escrita, no iterador
+    # síncrono da StreamingResponse, também fora do event loop
+    try:
+        table = await run_in_threadpool(records_to_table, result["data"])
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        content = await run_in_threadpool(_pandas_csv, result["data"])
+        return Response(content=content, media_type="text/csv")
+    return StreamingResponse(iter_csv(table), media_type="text/csv")
+
+
+async def _records_table(result: Dict[str, Any]) -> pa.Table:
+    if not result.get("data"):
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail="Nenhum dado encontrado para os critérios especificados"
+        )
+    # A montagem da tabela roda no pool de threads; a escrita, no iterador
+    # síncrono da StreamingResponse, também fora do event loop
+    return await run_in_threadpool(records_to_table, result["data"])
+
+
+async def _parquet_format(result: Dict[str, Any], name: str, layout: str = "row") -> StreamingResponse:
+    table = await _records_table(result)
+    return parquet_response(table, f"{name}.parquet")
+
+
+async def _arrow_format(result: Dict[str, Any], name: str, layout: str = "row") -> StreamingResponse:
+    table = await _records_table(result)
+    return StreamingResponse(
+        iter_arrow_stream(table),
+        media_type=ARROW_STREAM_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename={name}.arrows"},
+    )
+
+
+FORMATTERS: Dict[str, Callable[..., Awaitable[Any]]] = {
+    "json": _json_format,
+    "csv": _csv_format,
+    "parquet": _parquet_format,
+    "arrow": _arrow_format,
+}
+
+
+async def _tee_serialized(body: AsyncIterator[bytes], key: Hashable, media_type: str,
+                          headers: Dict[str, str]) -> AsyncIterator[bytes]:
+    # Repassa as partes ao cliente e guarda o arquivo completo ao final; se a
+    # transmissão for interrompida, nada é guardado
+    parts = []
+    async for chunk in body:
+        parts.append(chunk)
+        yield chunk
+    set_serialized(key, (b"".join(parts), media_type, headers))
+
+
+async def format_response(result: Dict[str, Any], format: str, name: str, layout: str = "row",
+                          query: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Serializa o resultado no formato pedido.
+
+    Com ``query``, os formatos de arquivo são guardados já serializados, e
+    uma consulta idêntica devolve os mesmos bytes sem serializar de novo;
+    resultados recusados por ``is_cacheable``, como os de fallback, são
+    sempre serializados.
+
+    Args:
+        result: Resultado do serviço de dados, com a lista de registros em ``data``
+        format: Um dos formatos de ``FORMATTERS``
+        name: Nome base do arquivo anexado, sem extensão (ex.: "producao")
+        layout: Disposição do JSON ("row" ou "column"); ignorada pelos formatos de arquivo
+        query: Parâmetros da consulta que produziu ``result``
+    """
+    cacheable = format != "json" and query is not None and is_cacheable(result)
+    if not cacheable:
+        return await FORMATTERS[format](result, name, layout)
+
+    key = (name, format, tuple(sorted(query.items())))
+    entry = get_serialized(key)
+    if entry is not None:
+        content, media_type, headers = entry
+        return Response(content=content, media_type=media_type, headers=headers)
+
+    response = await FORMATTERS[format](result, name, layout)
+    headers = {"Content-Disposition": response.headers["content-disposition"]} if "content-disposition" in response.headers else {}
+    if isinstance(response, StreamingResponse):
+        response.body_iterator = _tee_serialized(response.body_iterator, key, response.media_type, headers)
+    else:
+        set_serialized(key, (bytes(response.body), response.media_type, headers))
+    return response
@@ -32,6 +32,9 @@ USERS_DB = {
     },
 }
 
+# Reverse index id -> (email, user) used when refreshing tokens
+USERS_BY_ID = {user["id"]: (email, user) for email, user in USERS_DB.items()}
+
 
 router = APIRouter()
 
@@ -129,20 +132,13 @@ async def refresh_token(token: str):
             )
         
         # Find the user
-        user_id = token_data.sub
-        email = None
-        for k, v in USERS_DB.items():
-            if v["id"] == user_id:
-                email = k
-                break
-                
-        if not email:
+        entry = USERS_BY_ID.get(token_data.sub)
+        if not entry:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Usuário não encontrado",
             )
-            
-        user = USERS_DB[email]
+        email, user = entry
         
         # Create new access token
         token_data_dict = {
@@ -1,21 +1,61 @@
 import logging
-from typing import Optional, List
-from fastapi import APIRouter, Query, Depends, HTTPException, Response
+from itertools import repeat
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Query, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND, HTTP_429_TOO_MANY_REQUESTS
+from starlette.concurrency import run_in_threadpool
+from starlette.status import HTTP_401_UNAUTHORIZED
+import numpy as np
 import pandas as pd
-import json
-from io import StringIO
-import pyarrow as pa
-import pyarrow.parquet as pq
 
 from app.services.data_service import vini_data_service
-from app.schemas.data import DataResponse, ErrorResponse, DataFilter
+from app.schemas.data import ErrorResponse
+from app.api.v1.endpoints._cache import cached_result
+from app.api.v1.endpoints._formats import DATA_RESPONSES, JsonLayout, ResponseFormat, format_response
+from app.api.v1.endpoints._classify import all_classified, compile_keyword_patterns, build_text_column, classify_text_column
 
-router = APIRouter()
+# Respostas JSON serializadas pelo orjson, em C, em vez do json da biblioteca padrão
+router = APIRouter(default_response_class=ORJSONResponse)
 security = HTTPBearer()
 logger = logging.getLogger(__name__)
 
+# Palavras-chave por rótulo, compiladas uma única vez na importação do módulo
+_CANAL_MAPPING = {
+    "varejo": ("varejo", "pequeno comércio", "pequeno comercio", "loja", "mercearia", "empório", "emporio"),
+    "grandes_redes": ("supermercado", "atacado", "rede", "hipermercado", "atacarejo", "wholesale", "carrefour", "pão de açúcar", "walmart"),
+    "exportacao_indireta": ("exportação", "exportacao", "intermediário", "intermediario", "trading", "comercial export"),
+    "venda_direta": ("venda direta", "consumidor final", "ecommerce", "e-commerce", "online", "própria", "propria", "vinícola", "vinicola")
+}
+_CANAL_PATTERNS = compile_keyword_patterns(_CANAL_MAPPING)
+
+_PRODUTO_MAPPING = {
+    "vinhos": ("vinho", "tinto", "branco", "rosé", "rose", "mesa", "fino", "cabernet", "merlot", "chardonnay"),
+    "espumantes": ("espumante", "frisante", "champagne", "moscatel", "prosecco", "brut"),
+    "sucos": ("suco", "néctar", "bebida", "mosto", "integral", "concentrado"),
+    "uvas": ("uva", "fresca", "in natura", "niágara", "itália", "italia", "rubi", "benitaka")
+}
+_SUBCATEGORIA_PATTERNS = compile_keyword_patterns(_PRODUTO_MAPPING)
+
+# Campos que podem conter informação do canal e do produto
+_CANAL_CAMPOS = ("Canal", "canal", "Vendedor", "vendedor", "Distribuição", "distribuicao", "Distribuicao", "Origem")
+_PRODUTO_CAMPOS = ("Produto", "produto", "Descrição", "Descricao", "descrição", "descricao", "item", "Item", "Categoria")
+_CLASSIFICACAO_CAMPOS = list(dict.fromkeys(_CANAL_CAMPOS + _PRODUTO_CAMPOS + ("Volume",)))
+
+
+def _volume_numerico(coluna: pd.Series) -> np.ndarray:
+    """
+    Converte a coluna Volume em números de uma só vez.
+
+    Segue a regra do cálculo original por registro: números valem como estão,
+    textos só quando são compostos apenas de dígitos ("1.000" e "12,5" valem
+    0) e qualquer outro valor, inclusive ausente, vale 0.
+    """
+    if pd.api.types.is_numeric_dtype(coluna):
+        return coluna.astype(float).fillna(0).to_numpy()
+    valores = coluna.mask(coluna.str.isdigit().eq(False))
+    return pd.to_numeric(valores, errors="coerce").fillna(0).to_numpy()
+
 # JWT validation function (simplified for example)
 async def has_access(credentials: HTTPAuthorizationCredentials = Depends(security)):
     # In a real application, we would validate JWT here
@@ -28,10 +68,69 @@ async def has_access(credentials: HTTPAuthorizationCredentials = Depends(securit
     return True
 
 
+def _dados_classificados(
+    start_year: int,
+    end_year: int,
+    canal: Optional[str],
+    subcategoria: Optional[str],
+    produto: Optional[str],
+    regiao: Optional[str],
+) -> Dict[str, Any]:
+    """Obtém os dados de comercialização e identifica o canal e a subcategoria de cada registro."""
+    # Obtenha os dados
+    result = vini_data_service.get_data(
+        category="comercializacao",
+        start_year=start_year,
+        end_year=end_year,
+        subcategory=subcategoria,
+        channel=canal,
+        product_type=produto,
+        region=regiao,
+    )
+    
+    # Limpe os cabeçalhos desnecessários
+    if result.get("data"):
+        result["data"] = vini_data_service.clean_unnecessary_headers(result["data"])
+        
+        # Classifica todos os registros de uma vez sobre o texto concatenado,
+        # montando o DataFrame uma única vez, só com as colunas lidas; campos
+        # que a fonte já preencheu em todos os registros não são classificados
+        classificar_canal = not canal and not all_classified(result["data"], "canal")
+        classificar_subcategoria = not subcategoria and not all_classified(result["data"])
+        canais = subcategorias = repeat(None)
+        if classificar_canal or classificar_subcategoria:
+            df = pd.DataFrame(result["data"], columns=_CLASSIFICACAO_CAMPOS)
+            if classificar_canal:
+                canais = classify_text_column(build_text_column(df, _CANAL_CAMPOS), _CANAL_PATTERNS)
+                # Sem canal identificado, volumes maiores tendem a ser grandes
+                # redes; os demais ficam como varejo (mais comum)
+                por_volume = np.where(_volume_numerico(df["Volume"]) > 10000, "grandes_redes", "varejo").astype(object)
+                canais = np.where(canais == None, por_volume, canais)  # noqa: E711
+            if classificar_subcategoria:
+                # Se não identificou, coloca como vinhos (mais comum)
+                subcategorias = classify_text_column(build_text_column(df, _PRODUTO_CAMPOS), _SUBCATEGORIA_PATTERNS, default="vinhos")
+        
+        # Uma única passada grava canal e subcategoria em cada registro
+        for item, canal_nome, subcategoria_nome in zip(result["data"], canais, subcategorias):
+            if canal:
+                # Adicione o canal usando o valor fornecido
+                item["canal"] = canal
+            elif "canal" not in item:
+                item["canal"] = canal_nome
+            
+            if subcategoria:
+                # Adicione a subcategoria usando o valor fornecido
+                item["subcategoria"] = subcategoria
+            elif "subcategoria" not in item:
+                item["subcategoria"] = subcategoria_nome
+    
+    return result
+
+
 @router.get(
     "/",
-    response_model=DataResponse,
     responses={
+        **DATA_RESPONSES,
         404: {"model": ErrorResponse},
         429: {"model": ErrorResponse},
         503: {"model": ErrorResponse},
@@ -46,7 +145,8 @@ async def get_comercializacao(
                                        enum=["vinhos", "espumantes", "sucos", "uvas"]),
     produto: Optional[str] = Query(None, description="Tipo específico de produto"),
     regiao: Optional[str] = Query(None, description="Região geográfica"),
-    format: str = Query("json", description="Formato da resposta (json, csv, parquet)"),
+    format: ResponseFormat = Query("json", description="Formato da resposta (json, csv, parquet, arrow)"),
+    layout: JsonLayout = Query("row", description="Disposição do JSON: registros (row) ou listas por campo (column)"),
     _: bool = Depends(has_access)
 ):
     """
@@ -65,126 +165,21 @@ async def get_comercializacao(
     - **uvas**: Comercialização de uvas in natura
     """
     try:
-        # Obtenha os dados
-        result = vini_data_service.get_data(
-            category="comercializacao",
-            start_year=start_year,
-            end_year=end_year,
-            subcategory=subcategoria,
-            channel=canal,
-            product_type=produto,
-            region=regiao,
-        )
+        consulta = {
+            "start_year": start_year,
+            "end_year": end_year,
+            "canal": canal,
+            "subcategoria": subcategoria,
+            "produto": produto,
+            "regiao": regiao,
+        }
         
-        # Limpe os cabeçalhos desnecessários
-        if result.get("data"):
-            result["data"] = vini_data_service.clean_unnecessary_headers(result["data"])
-            
-            # Se não foi especificado um canal, tente identificar em cada registro
-            if not canal:
-                # Tente identificar o canal de cada registro com base em palavras-chave
-                canal_mapping = {
-                    "varejo": ["varejo", "pequeno comércio", "pequeno comercio", "loja", "mercearia", "empório", "emporio"],
-                    "grandes_redes": ["supermercado", "atacado", "rede", "hipermercado", "atacarejo", "wholesale", "carrefour", "pão de açúcar", "walmart"],
-                    "exportacao_indireta": ["exportação", "exportacao", "intermediário", "intermediario", "trading", "comercial export"],
-                    "venda_direta": ["venda direta", "consumidor final", "ecommerce", "e-commerce", "online", "própria", "propria", "vinícola", "vinicola"]
-                }
-                
-                for item in result["data"]:
-                    # Verifica se já tem canal identificado
-                    if "canal" not in item:
-                        # Verifica texto para identificar o canal
-                        item_text = ""
-                        for campo in ["Canal", "canal", "Vendedor", "vendedor", "Distribuição", "distribuicao", "Distribuicao", "Origem"]:
-                            if campo in item and item[campo]:
-                                item_text += str(item[campo]).lower() + " "
-                        
-                        # Verifica se o texto do item contém palavras-chave dos canais
-                        for canal_nome, palavras_chave in canal_mapping.items():
-                            if any(palavra in item_text for palavra in palavras_chave):
-                                item["canal"] = canal_nome
-                                break
-                        
-                        # Se não identificou o canal, verifica pelo volume/valor
-                        if "canal" not in item and "Volume" in item:
-                            volume = float(item["Volume"]) if isinstance(item["Volume"], (int, float)) or (isinstance(item["Volume"], str) and item["Volume"].isdigit()) else 0
-                            # Volumes maiores tendem a ser grandes redes
-                            if volume > 10000:
-                                item["canal"] = "grandes_redes"
-                            # Volumes menores tendem a ser varejo
-                            elif volume > 0:
-                                item["canal"] = "varejo"
-                        
-                        # Se mesmo assim não identificou, coloca como varejo (mais comum)
-                        if "canal" not in item:
-                            item["canal"] = "varejo"
-            else:
-                # Adicione o canal em cada registro usando o valor fornecido
-                for item in result["data"]:
-                    item["canal"] = canal
-            
-            # Se não foi especificada uma subcategoria, tente identificar em cada registro
-            if not subcategoria:
-                # Tente identificar a subcategoria de cada registro com base no produto
-                produto_mapping = {
-                    "vinhos": ["vinho", "tinto", "branco", "rosé", "rose", "mesa", "fino", "cabernet", "merlot", "chardonnay"],
-                    "espumantes": ["espumante", "frisante", "champagne", "moscatel", "prosecco", "brut"],
-                    "sucos": ["suco", "néctar", "bebida", "mosto", "integral", "concentrado"],
-                    "uvas": ["uva", "fresca", "in natura", "niágara", "itália", "italia", "rubi", "benitaka"]
-                }
-                
-                for item in result["data"]:
-                    # Verifica se já tem subcategoria identificada
-                    if "subcategoria" not in item:
-                        # Verifica o texto de produto para identificar a subcategoria
-                        # Procura em diferentes campos que podem conter informação do produto
-                        item_text = ""
-                        for campo in ["Produto", "produto", "Descrição", "Descricao", "descrição", "descricao", "item", "Item", "Categoria"]:
-                            if campo in item and item[campo]:
-                                item_text += str(item[campo]).lower() + " "
-                        
-                        # Verifica se o texto do item contém palavras-chave das subcategorias
-                        for subcategoria_nome, palavras_chave in produto_mapping.items():
-                            if any(palavra in item_text for palavra in palavras_chave):
-                                item["subcategoria"] = subcategoria_nome
-                                break
-                                
-                        # Se mesmo assim não identificou, coloca como vinhos (mais comum)
-                        if "subcategoria" not in item:
-                            item["subcategoria"] = "vinhos"
-            else:
-                # Adicione a subcategoria em cada registro usando o valor fornecido
-                for item in result["data"]:
-                    item["subcategoria"] = subcategoria
+        # Dados já classificados, reaproveitados entre consultas idênticas; a
+        # busca bloqueante roda fora do event loop, que segue atendendo outras
+        # requisições
+        result = await run_in_threadpool(cached_result, "comercializacao", _dados_classificados, **consulta)
         
-        # Handle different output formats
-        if format == "csv":
-            if not result.get("data"):
-                return Response(content="", media_type="text/csv")
-                
-            df = pd.DataFrame(result["data"])
-            csv_data = df.to_csv(index=False)
-            return Response(content=csv_data, media_type="text/csv")
-            
-        elif format == "parquet":
-            if not result.get("data"):
-                raise HTTPException(
-                    status_code=HTTP_404_NOT_FOUND,
-                    detail="Nenhum dado encontrado para os critérios especificados"
-                )
-                
-            df = pd.DataFrame(result["data"])
-            table = pa.Table.from_pandas(df)
-            sink = pa.BufferOutputStream()
-            pq.write_table(table, sink)
-            return Response(
-                content=sink.getvalue().to_pybytes(),
-                media_type="application/octet-stream",
-                headers={"Content-Disposition": "attachment; filename=comercializacao.parquet"}
-            )
-            
-        # Default: return JSON
-        return result
+        return await format_response(result, format, "comercializacao", layout, consulta)
             
     except Exception as e:
         logger.error(f"Erro ao buscar dados de comercialização: {str(e)}")
@@ -1,21 +1,46 @@
 import logging
-from typing import Optional, List
-from fastapi import APIRouter, Query, Depends, HTTPException, Response
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Query, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND, HTTP_429_TOO_MANY_REQUESTS
-import pandas as pd
-import json
-from io import StringIO
-import pyarrow as pa
-import pyarrow.parquet as pq
+from starlette.concurrency import run_in_threadpool
+from starlette.status import HTTP_401_UNAUTHORIZED
 
 from app.services.data_service import vini_data_service
-from app.schemas.data import DataResponse, ErrorResponse, DataFilter
+from app.schemas.data import ErrorResponse
+from app.api.v1.endpoints._cache import cached_result
+from app.api.v1.endpoints._formats import DATA_RESPONSES, JsonLayout, ResponseFormat, format_response
+from app.api.v1.endpoints._classify import all_classified, compile_keyword_patterns, classify_records
 
-router = APIRouter()
+# Respostas JSON serializadas pelo orjson, em C, em vez do json da biblioteca padrão
+router = APIRouter(default_response_class=ORJSONResponse)
 security = HTTPBearer()
 logger = logging.getLogger(__name__)
 
+# Palavras-chave por rótulo, compiladas uma única vez na importação do módulo
+_PRODUTO_MAPPING = {
+    "vinhos": ("vinho", "cabernet", "merlot", "chardonnay", "vinhos de mesa", "vinho fino", "tinto", "branco"),
+    "espumantes": ("espumante", "champagne", "moscatel", "frisante", "prosecco", "brut", "cava"),
+    "sucos": ("suco", "néctar", "bebida", "concentrado", "integral"),
+    "passas": ("passa", "passas", "uva passa", "uva seca", "sultana", "raisins"),
+    "frescas": ("fresca", "frescas", "uva fresca", "mesa", "in natura", "thompson", "crimson")
+}
+_SUBCATEGORIA_PATTERNS = compile_keyword_patterns(_PRODUTO_MAPPING)
+
+# Campos que podem conter informação do produto
+_PRODUTO_CAMPOS = ("Produto", "produto", "Descrição", "Descricao", "descrição", "descricao", "item")
+
+# Países mais conhecidos por exportar vinhos
+_PAISES_VINHOS = frozenset({"chile", "argentina", "frança", "franca", "portugal", "espanha", "italia", "itália"})
+# Países mais conhecidos por exportar uvas frescas
+_PAISES_FRESCAS = frozenset({"chile", "argentina", "estados unidos", "eua"})
+
+# Subcategoria presumida pelo país; em países das duas listas, vinhos prevalece
+_PAIS_SUBCATEGORIA = {pais: "frescas" for pais in _PAISES_FRESCAS}
+_PAIS_SUBCATEGORIA.update(dict.fromkeys(_PAISES_VINHOS, "vinhos"))
+# Campos que podem conter o país, na ordem de preferência
+_PAIS_CAMPOS = ("País", "Pais", "país", "pais")
+
 # JWT validation function (simplified for example)
 async def has_access(credentials: HTTPAuthorizationCredentials = Depends(security)):
     # In a real application, we would validate JWT here
@@ -28,10 +53,56 @@ async def has_access(credentials: HTTPAuthorizationCredentials = Depends(securit
     return True
 
 
+def _dados_classificados(
+    start_year: int,
+    end_year: int,
+    subcategoria: Optional[str],
+    produto: Optional[str],
+    origem: Optional[str],
+) -> Dict[str, Any]:
+    """Obtém os dados de importação e identifica a subcategoria de cada registro."""
+    # Obtenha os dados
+    result = vini_data_service.get_data(
+        category="importacao",
+        start_year=start_year,
+        end_year=end_year,
+        subcategory=subcategoria,
+        product_type=produto,
+        origin=origem,
+    )
+    
+    # Limpe os cabeçalhos desnecessários
+    if result.get("data"):
+        result["data"] = vini_data_service.clean_unnecessary_headers(result["data"])
+        
+        # Se não foi especificada uma subcategoria, mas temos vários tipos de dados,
+        # identifique a subcategoria de cada registro (se a fonte já não o fez)
+        if not subcategoria and not all_classified(result["data"]):
+            # Procura em diferentes campos que podem conter informação do produto
+            subcategorias = classify_records(result["data"], _PRODUTO_CAMPOS, _SUBCATEGORIA_PATTERNS)
+            
+            for item, subcategoria_nome in zip(result["data"], subcategorias):
+                # Verifica se já tem subcategoria identificada
+                if "subcategoria" not in item:
+                    # Se não identificou pelo produto, verifica se é um país conhecido por exportar um tipo específico
+                    if not subcategoria_nome:
+                        pais = next((item[campo] for campo in _PAIS_CAMPOS if campo in item), "")
+                        subcategoria_nome = _PAIS_SUBCATEGORIA.get(str(pais).lower())
+                    
+                    # Se mesmo assim não identificou, coloca como a mais comum (vinhos)
+                    item["subcategoria"] = subcategoria_nome or "vinhos"
+        elif subcategoria:
+            # Adicione a subcategoria em cada registro usando o valor fornecido
+            for item in result["data"]:
+                item["subcategoria"] = subcategoria
+    
+    return result
+
+
 @router.get(
     "/",
-    response_model=DataResponse,
     responses={
+        **DATA_RESPONSES,
         404: {"model": ErrorResponse},
         429: {"model": ErrorResponse},
         503: {"model": ErrorResponse},
@@ -44,7 +115,8 @@ async def get_importacao(
                                        enum=["vinhos", "espumantes", "sucos", "passas", "frescas"]),
     produto: Optional[str] = Query(None, description="Tipo específico de produto dentro da subcategoria"),
     origem: Optional[str] = Query(None, description="País ou região de origem da importação"),
-    format: str = Query("json", description="Formato da resposta (json, csv, parquet)"),
+    format: ResponseFormat = Query("json", description="Formato da resposta (json, csv, parquet, arrow)"),
+    layout: JsonLayout = Query("row", description="Disposição do JSON: registros (row) ou listas por campo (column)"),
     _: bool = Depends(has_access)
 ):
     """
@@ -57,95 +129,20 @@ async def get_importacao(
     - **frescas**: Importação de uvas frescas
     """
     try:
-        # Obtenha os dados
-        result = vini_data_service.get_data(
-            category="importacao",
-            start_year=start_year,
-            end_year=end_year,
-            subcategory=subcategoria,
-            product_type=produto,
-            origin=origem,
-        )
+        consulta = {
+            "start_year": start_year,
+            "end_year": end_year,
+            "subcategoria": subcategoria,
+            "produto": produto,
+            "origem": origem,
+        }
         
-        # Limpe os cabeçalhos desnecessários
-        if result.get("data"):
-            result["data"] = vini_data_service.clean_unnecessary_headers(result["data"])
-            
-            # Se não foi especificada uma subcategoria, mas temos vários tipos de dados,
-            # identifique a subcategoria de cada registro
-            if not subcategoria:
-                # Tente identificar a subcategoria de cada registro com base no produto
-                produto_mapping = {
-                    "vinhos": ["vinho", "cabernet", "merlot", "chardonnay", "vinhos de mesa", "vinho fino", "tinto", "branco"],
-                    "espumantes": ["espumante", "champagne", "moscatel", "frisante", "prosecco", "brut", "cava"],
-                    "sucos": ["suco", "néctar", "bebida", "concentrado", "integral"],
-                    "passas": ["passa", "passas", "uva passa", "uva seca", "sultana", "raisins"],
-                    "frescas": ["fresca", "frescas", "uva fresca", "mesa", "in natura", "thompson", "crimson"]
-                }
-                
-                for item in result["data"]:
-                    # Verifica se já tem subcategoria identificada
-                    if "subcategoria" not in item:
-                        # Verifica o texto de produto para identificar a subcategoria
-                        # Procura em diferentes campos que podem conter informação do produto
-                        item_text = ""
-                        for campo in ["Produto", "produto", "Descrição", "Descricao", "descrição", "descricao", "item"]:
-                            if campo in item and item[campo]:
-                                item_text += str(item[campo]).lower() + " "
-                        
-                        # Verifica se o texto do item contém palavras-chave das subcategorias
-                        for subcategoria_nome, palavras_chave in produto_mapping.items():
-                            if any(palavra in item_text for palavra in palavras_chave):
-                                item["subcategoria"] = subcategoria_nome
-                                break
-                        
-                        # Se ainda não identificou a subcategoria, verifica se é um país conhecido por exportar um tipo específico
-                        if "subcategoria" not in item and ("País" in item or "Pais" in item or "país" in item or "pais" in item):
-                            pais = str(item.get("País", item.get("Pais", item.get("país", item.get("pais", ""))))).lower()
-                            
-                            # Países mais conhecidos por exportar vinhos
-                            if pais in ["chile", "argentina", "frança", "franca", "portugal", "espanha", "italia", "itália"]:
-                                item["subcategoria"] = "vinhos"
-                            # Países mais conhecidos por exportar uvas frescas
-                            elif pais in ["chile", "argentina", "estados unidos", "eua"]:
-                                item["subcategoria"] = "frescas"
-                        
-                        # Se mesmo assim não identificou, coloca como a mais comum (vinhos)
-                        if "subcategoria" not in item:
-                            item["subcategoria"] = "vinhos"
-            else:
-                # Adicione a subcategoria em cada registro usando o valor fornecido
-                for item in result["data"]:
-                    item["subcategoria"] = subcategoria
+        # Dados já classificados, reaproveitados entre consultas idênticas; a
+        # busca bloqueante roda fora do event loop, que segue atendendo outras
+        # requisições
+        result = await run_in_threadpool(cached_result, "importacao", _dados_classificados, **consulta)
         
-        # Handle different output formats
-        if format == "csv":
-            if not result.get("data"):
-                return Response(content="", media_type="text/csv")
-                
-            df = pd.DataFrame(result["data"])
-            csv_data = df.to_csv(index=False)
-            return Response(content=csv_data, media_type="text/csv")
-            
-        elif format == "parquet":
-            if not result.get("data"):
-                raise HTTPException(
-                    status_code=HTTP_404_NOT_FOUND,
-                    detail="Nenhum dado encontrado para os critérios especificados"
-                )
-                
-            df = pd.DataFrame(result["data"])
-            table = pa.Table.from_pandas(df)
-            sink = pa.BufferOutputStream()
-            pq.write_table(table, sink)
-            return Response(
-                content=sink.getvalue().to_pybytes(),
-                media_type="application/octet-stream",
-                headers={"Content-Disposition": "attachment; filename=importacao.parquet"}
-            )
-            
-        # Default: return JSON
-        return result
+        return await format_response(result, format, "importacao", layout, consulta)
             
     except Exception as e:
         logger.error(f"Erro ao buscar dados de importação: {str(e)}")
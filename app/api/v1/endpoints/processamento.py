@@ -1,21 +1,31 @@
 import logging
-from typing import Optional, List
-from fastapi import APIRouter, Query, Depends, HTTPException, Response
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Query, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND, HTTP_429_TOO_MANY_REQUESTS
-import pandas as pd
-import json
-from io import StringIO
-import pyarrow as pa
-import pyarrow.parquet as pq
+from starlette.concurrency import run_in_threadpool
+from starlette.status import HTTP_401_UNAUTHORIZED
 
 from app.services.data_service import vini_data_service
-from app.schemas.data import DataResponse, ErrorResponse, DataFilter
+from app.schemas.data import ErrorResponse
+from app.api.v1.endpoints._cache import cached_result
+from app.api.v1.endpoints._formats import DATA_RESPONSES, JsonLayout, ResponseFormat, format_response
+from app.api.v1.endpoints._classify import all_classified, compile_keyword_patterns, classify_records
 
-router = APIRouter()
+# Respostas JSON serializadas pelo orjson, em C, em vez do json da biblioteca padrão
+router = APIRouter(default_response_class=ORJSONResponse)
 security = HTTPBearer()
 logger = logging.getLogger(__name__)
 
+# Palavras-chave para identificação de subcategorias, compiladas uma única vez
+_CULTIVAR_MAPPING = {
+    "viniferas": ("cabernet", "merlot", "chardonnay", "tannat", "pinot", "sauvignon", "syrah", "viognier", "malbec"),
+    "americanas": ("isabel", "bordô", "bordo", "niágara", "niagara", "concord", "jacquez", "herbemont", "seibel"),
+    "mesa": ("italia", "itália", "rubi", "benitaka", "red globe", "thompson")
+}
+_CULTIVAR_PATTERNS = compile_keyword_patterns(_CULTIVAR_MAPPING)
+_CULTIVAR_CAMPOS = ("Cultivar",)
+
 # JWT validation function (simplified for example)
 async def has_access(credentials: HTTPAuthorizationCredentials = Depends(security)):
     # In a real application, we would validate JWT here
@@ -28,10 +38,55 @@ async def has_access(credentials: HTTPAuthorizationCredentials = Depends(securit
     return True
 
 
+def _dados_classificados(
+    start_year: int,
+    end_year: int,
+    subcategoria: Optional[str],
+    tipo_uva: Optional[str],
+    regiao: Optional[str],
+) -> Dict[str, Any]:
+    """Obtém os dados de processamento industrial e identifica a subcategoria de cada registro."""
+    # Passamos a subcategoria diretamente, incluindo "semclassificacao"
+    # para que o serviço de dados possa utilizar o arquivo de fallback correto
+    
+    # Obtenha os dados
+    result = vini_data_service.get_data(
+        category="processamento",
+        start_year=start_year,
+        end_year=end_year,
+        subcategory=subcategoria,  # Passamos a subcategoria diretamente
+        region=regiao,
+        product_type=tipo_uva,
+    )
+    
+    # Limpe os cabeçalhos desnecessários
+    if result.get("data"):
+        result["data"] = vini_data_service.clean_unnecessary_headers(result["data"])
+        
+        # Sem subcategoria específica, identificamos a de cada registro pelo
+        # cultivar, a não ser que todos já venham classificados da fonte
+        if not subcategoria and not all_classified(result["data"]):
+            # Classifica todos os registros de uma vez pela coluna Cultivar; se não
+            # identificou por palavras chave, coloca como sem classificação
+            subcategorias = classify_records(result["data"], _CULTIVAR_CAMPOS, _CULTIVAR_PATTERNS,
+                                             default="semclassificacao")
+            
+            for item, subcategoria_nome in zip(result["data"], subcategorias):
+                if "subcategoria" not in item:
+                    item["subcategoria"] = subcategoria_nome
+        
+        # Se estamos filtrando por uma subcategoria específica diferente de semclassificacao
+        elif subcategoria and subcategoria != "semclassificacao":
+            for item in result["data"]:
+                item["subcategoria"] = subcategoria
+    
+    return result
+
+
 @router.get(
     "/",
-    response_model=DataResponse,
     responses={
+        **DATA_RESPONSES,
         404: {"model": ErrorResponse},
         429: {"model": ErrorResponse},
         503: {"model": ErrorResponse},
@@ -44,7 +99,8 @@ async def get_processamento(
                                         enum=["viniferas", "americanas", "mesa", "semclassificacao"]),
     tipo_uva: Optional[str] = Query(None, description="Filtrar por tipo específico de uva (ex: Cabernet, Isabel, etc)"),
     regiao: Optional[str] = Query(None, description="Filtrar por região geográfica"),
-    format: str = Query("json", description="Formato da resposta (json, csv, parquet)"),
+    format: ResponseFormat = Query("json", description="Formato da resposta (json, csv, parquet, arrow)"),
+    layout: JsonLayout = Query("row", description="Disposição do JSON: registros (row) ou listas por campo (column)"),
     _: bool = Depends(has_access)
 ):
     """
@@ -56,83 +112,20 @@ async def get_processamento(
     - **semclassificacao**: Processamento de uvas sem classificação específica
     """
     try:
-        # Passamos a subcategoria diretamente, incluindo "semclassificacao"
-        # para que o serviço de dados possa utilizar o arquivo de fallback correto
-        
-        # Obtenha os dados
-        result = vini_data_service.get_data(
-            category="processamento",
-            start_year=start_year,
-            end_year=end_year,
-            subcategory=subcategoria,  # Passamos a subcategoria diretamente
-            region=regiao,
-            product_type=tipo_uva,
-        )
+        consulta = {
+            "start_year": start_year,
+            "end_year": end_year,
+            "subcategoria": subcategoria,
+            "tipo_uva": tipo_uva,
+            "regiao": regiao,
+        }
         
-        # Limpe os cabeçalhos desnecessários
-        if result.get("data"):
-            result["data"] = vini_data_service.clean_unnecessary_headers(result["data"])
-            
-            # Definição das palavras-chave para identificação de subcategorias
-            cultivar_mapping = {
-                "viniferas": ["cabernet", "merlot", "chardonnay", "tannat", "pinot", "sauvignon", "syrah", "viognier", "malbec"],
-                "americanas": ["isabel", "bordô", "bordo", "niágara", "niagara", "concord", "jacquez", "herbemont", "seibel"],
-                "mesa": ["italia", "itália", "rubi", "benitaka", "red globe", "thompson"]
-            }
-            
-            # Aplicamos a classificação apenas se não tivermos uma subcategoria específica
-            # ou se precisamos adicionar metadados de subcategoria aos resultados
-            if not subcategoria or subcategoria != "semclassificacao":
-                for item in result["data"]:
-                    # Se não tem subcategoria, vamos identificar
-                    if "subcategoria" not in item:
-                        # Verifica cultivar para identificar a subcategoria
-                        cultivar = item.get("Cultivar", "").lower() if "Cultivar" in item else ""
-                        is_classified = False
-                        
-                        if cultivar:
-                            for subcategoria_nome, palavras_chave in cultivar_mapping.items():
-                                if any(palavra in cultivar for palavra in palavras_chave):
-                                    item["subcategoria"] = subcategoria_nome
-                                    is_classified = True
-                                    break
-                        
-                        # Se não identificou por palavras chave, coloca como sem classificação
-                        if not is_classified:
-                            item["subcategoria"] = "semclassificacao"
-                    
-                    # Se estamos filtrando por uma subcategoria específica diferente de semclassificacao
-                    if subcategoria and subcategoria != "semclassificacao":
-                        item["subcategoria"] = subcategoria
+        # Dados já classificados, reaproveitados entre consultas idênticas; a
+        # busca bloqueante roda fora do event loop, que segue atendendo outras
+        # requisições
+        result = await run_in_threadpool(cached_result, "processamento", _dados_classificados, **consulta)
         
-        # Handle different output formats
-        if format == "csv":
-            if not result.get("data"):
-                return Response(content="", media_type="text/csv")
-                
-            df = pd.DataFrame(result["data"])
-            csv_data = df.to_csv(index=False)
-            return Response(content=csv_data, media_type="text/csv")
-            
-        elif format == "parquet":
-            if not result.get("data"):
-                raise HTTPException(
-                    status_code=HTTP_404_NOT_FOUND,
-                    detail="Nenhum dado encontrado para os critérios especificados"
-                )
-                
-            df = pd.DataFrame(result["data"])
-            table = pa.Table.from_pandas(df)
-            sink = pa.BufferOutputStream()
-            pq.write_table(table, sink)
-            return Response(
-                content=sink.getvalue().to_pybytes(),
-                media_type="application/octet-stream",
-                headers={"Content-Disposition": "attachment; filename=processamento.parquet"}
-            )
-            
-        # Default: return JSON
-        return result
+        return await format_response(result, format, "processamento", layout, consulta)
             
     except Exception as e:
         logger.error(f"Erro ao buscar dados de processamento: {str(e)}")
@@ -1,21 +1,37 @@
 import logging
-from typing import Optional, List
-from fastapi import APIRouter, Query, Depends, HTTPException, Response
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Query, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND, HTTP_429_TOO_MANY_REQUESTS
+from starlette.concurrency import run_in_threadpool
+from starlette.status import HTTP_401_UNAUTHORIZED
+import numpy as np
 import pandas as pd
-import json
-from io import StringIO
-import pyarrow as pa
-import pyarrow.parquet as pq
 
 from app.services.data_service import vini_data_service
-from app.schemas.data import DataResponse, ErrorResponse, DataFilter
+from app.schemas.data import ErrorResponse
+from app.api.v1.endpoints._cache import cached_result
+from app.api.v1.endpoints._formats import DATA_RESPONSES, JsonLayout, ResponseFormat, format_response
+from app.api.v1.endpoints._classify import all_classified, compile_keyword_patterns, build_text_column, classify_text_column
 
-router = APIRouter()
+# Respostas JSON serializadas pelo orjson, em C, em vez do json da biblioteca padrão
+router = APIRouter(default_response_class=ORJSONResponse)
 security = HTTPBearer()
 logger = logging.getLogger(__name__)
 
+# Palavras-chave por subcategoria, compiladas uma única vez na importação do módulo
+_PRODUTO_MAPPING = {
+    "uvas": ("uva", "videira", "parreiral", "cultivar", "vitis", "niágara", "itália", "bordô", "cabernet"),
+    "vinhos": ("vinho", "vinificação", "tinto", "branco", "rosé", "rose", "mesa", "fino"),
+    "sucos": ("suco", "mosto", "integral", "concentrado", "bebida", "néctar"),
+    "derivados": ("derivado", "fermentado", "aguardente", "grappa", "bagaceira", "cooler", "filtrado")
+}
+_SUBCATEGORIA_PATTERNS = compile_keyword_patterns(_PRODUTO_MAPPING)
+
+# Campos que podem conter informação do produto
+_PRODUTO_CAMPOS = ("Produto", "produto", "Descrição", "Descricao", "descrição", "descricao", "item", "Item", "Nome")
+_CLASSIFICACAO_CAMPOS = list(_PRODUTO_CAMPOS + ("Unidade",))
+
 # JWT validation function (simplified for example)
 async def has_access(credentials: HTTPAuthorizationCredentials = Depends(security)):
     # In a real application, we would validate JWT here
@@ -28,10 +44,59 @@ async def has_access(credentials: HTTPAuthorizationCredentials = Depends(securit
     return True
 
 
+def _dados_classificados(
+    start_year: int,
+    end_year: int,
+    subcategoria: Optional[str],
+    produto: Optional[str],
+    regiao: Optional[str],
+) -> Dict[str, Any]:
+    """Obtém os dados de produção e identifica a subcategoria de cada registro."""
+    # Obtenha os dados
+    result = vini_data_service.get_data(
+        category="producao",
+        start_year=start_year,
+        end_year=end_year,
+        subcategory=subcategoria,
+        region=regiao,
+        product_type=produto,
+    )
+    
+    # Limpe os cabeçalhos desnecessários
+    if result.get("data"):
+        result["data"] = vini_data_service.clean_unnecessary_headers(result["data"])
+        
+        # Se não foi especificada uma subcategoria, mas temos vários tipos de dados,
+        # identifique a subcategoria de cada registro (se a fonte já não o fez)
+        if not subcategoria and not all_classified(result["data"]):
+            # Classifica todos os registros de uma vez pelo texto dos campos de produto,
+            # com um DataFrame só das colunas lidas
+            df = pd.DataFrame(result["data"], columns=_CLASSIFICACAO_CAMPOS)
+            subcategorias = classify_text_column(build_text_column(df, _PRODUTO_CAMPOS), _SUBCATEGORIA_PATTERNS)
+            
+            # Se não identificou, tenta usar a unidade de medida: litros indicam
+            # vinhos; quilos, toneladas ou nenhuma unidade, uvas (mais comum)
+            unidade = df["Unidade"].where(df["Unidade"].notna(), "").astype(str).str.lower()
+            litros = ~unidade.str.contains("kg|ton", regex=True) & unidade.str.contains("l", regex=False)
+            por_unidade = np.where(litros, "vinhos", "uvas").astype(object)
+            subcategorias = np.where(subcategorias == None, por_unidade, subcategorias)  # noqa: E711
+            
+            for item, subcategoria_nome in zip(result["data"], subcategorias):
+                # Verifica se já tem subcategoria identificada
+                if "subcategoria" not in item:
+                    item["subcategoria"] = subcategoria_nome
+        elif subcategoria:
+            # Adicione a subcategoria em cada registro usando o valor fornecido
+            for item in result["data"]:
+                item["subcategoria"] = subcategoria
+    
+    return result
+
+
 @router.get(
     "/",
-    response_model=DataResponse,
     responses={
+        **DATA_RESPONSES,
         404: {"model": ErrorResponse},
         429: {"model": ErrorResponse},
         503: {"model": ErrorResponse},
@@ -44,7 +109,8 @@ async def get_producao(
                                        enum=["uvas", "vinhos", "sucos", "derivados"]),
     produto: Optional[str] = Query(None, description="Filtrar por tipo específico de produto"),
     regiao: Optional[str] = Query(None, description="Região geográfica"),
-    format: str = Query("json", description="Formato da resposta (json, csv, parquet)"),
+    format: ResponseFormat = Query("json", description="Formato da resposta (json, csv, parquet, arrow)"),
+    layout: JsonLayout = Query("row", description="Disposição do JSON: registros (row) ou listas por campo (column)"),
     _: bool = Depends(has_access)
 ):
     """
@@ -56,91 +122,20 @@ async def get_producao(
     - **derivados**: Produção de outros derivados de uva e vinho
     """
     try:
-        # Obtenha os dados
-        result = vini_data_service.get_data(
-            category="producao",
-            start_year=start_year,
-            end_year=end_year,
-            subcategory=subcategoria,
-            region=regiao,
-            product_type=produto,
-        )
+        consulta = {
+            "start_year": start_year,
+            "end_year": end_year,
+            "subcategoria": subcategoria,
+            "produto": produto,
+            "regiao": regiao,
+        }
         
-        # Limpe os cabeçalhos desnecessários
-        if result.get("data"):
-            result["data"] = vini_data_service.clean_unnecessary_headers(result["data"])
-            
-            # Se não foi especificada uma subcategoria, mas temos vários tipos de dados,
-            # identifique a subcategoria de cada registro
-            if not subcategoria:
-                # Tente identificar a subcategoria de cada registro com base no produto
-                produto_mapping = {
-                    "uvas": ["uva", "videira", "parreiral", "cultivar", "vitis", "niágara", "itália", "bordô", "cabernet"],
-                    "vinhos": ["vinho", "vinificação", "tinto", "branco", "rosé", "rose", "mesa", "fino"],
-                    "sucos": ["suco", "mosto", "integral", "concentrado", "bebida", "néctar"],
-                    "derivados": ["derivado", "fermentado", "aguardente", "grappa", "bagaceira", "cooler", "filtrado"]
-                }
-                
-                for item in result["data"]:
-                    # Verifica se já tem subcategoria identificada
-                    if "subcategoria" not in item:
-                        # Verifica o texto de produto para identificar a subcategoria
-                        # Procura em diferentes campos que podem conter informação do produto
-                        item_text = ""
-                        for campo in ["Produto", "produto", "Descrição", "Descricao", "descrição", "descricao", "item", "Item", "Nome"]:
-                            if campo in item and item[campo]:
-                                item_text += str(item[campo]).lower() + " "
-                        
-                        # Verifica se o texto do item contém palavras-chave das subcategorias
-                        for subcategoria_nome, palavras_chave in produto_mapping.items():
-                            if any(palavra in item_text for palavra in palavras_chave):
-                                item["subcategoria"] = subcategoria_nome
-                                break
-                        
-                        # Se mesmo assim não identificou, tenta usar a unidade de medida
-                        if "subcategoria" not in item and "Unidade" in item:
-                            unidade = str(item["Unidade"]).lower()
-                            if "kg" in unidade or "ton" in unidade:
-                                item["subcategoria"] = "uvas"
-                            elif "l" in unidade or "litro" in unidade:
-                                item["subcategoria"] = "vinhos"
-                        
-                        # Se mesmo assim não identificou, coloca como uvas (mais comum)
-                        if "subcategoria" not in item:
-                            item["subcategoria"] = "uvas"
-            else:
-                # Adicione a subcategoria em cada registro usando o valor fornecido
-                for item in result["data"]:
-                    item["subcategoria"] = subcategoria
+        # Dados já classificados, reaproveitados entre consultas idênticas; a
+        # busca bloqueante roda fora do event loop, que segue atendendo outras
+        # requisições
+        result = await run_in_threadpool(cached_result, "producao", _dados_classificados, **consulta)
         
-        # Handle different output formats
-        if format == "csv":
-            if not result.get("data"):
-                return Response(content="", media_type="text/csv")
-                
-            df = pd.DataFrame(result["data"])
-            csv_data = df.to_csv(index=False)
-            return Response(content=csv_data, media_type="text/csv")
-            
-        elif format == "parquet":
-            if not result.get("data"):
-                raise HTTPException(
-                    status_code=HTTP_404_NOT_FOUND,
-                    detail="Nenhum dado encontrado para os critérios especificados"
-                )
-                
-            df = pd.DataFrame(result["data"])
-            table = pa.Table.from_pandas(df)
-            sink = pa.BufferOutputStream()
-            pq.write_table(table, sink)
-            return Response(
-                content=sink.getvalue().to_pybytes(),
-                media_type="application/octet-stream",
-                headers={"Content-Disposition": "attachment; filename=producao.parquet"}
-            )
-            
-        # Default: return JSON
-        return result
+        return await format_response(result, format, "producao", layout, consulta)
             
     except Exception as e:
         logger.error(f"Erro ao buscar dados de produção: {str(e)}")
@@ -1,28 +1,30 @@
 import os
 import secrets
+from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional, Union
 
-from pydantic import BaseModel
 
-
-class Settings(BaseModel):
-    """API Configuration Settings"""
+@dataclass(frozen=True)
+class Settings:
+    """API Configuration Settings (read-only after startup)"""
     
     # API Info
     API_V1_STR: str = "/v1"
     PROJECT_NAME: str = "Vini Data API"
     
     # Security
-    SECRET_KEY: str = secrets.token_urlsafe(32)
+    # Set SECRET_KEY in the environment so every worker signs tokens with the
+    # same key; the random fallback only suits a single-process dev server
+    SECRET_KEY: str = os.getenv("SECRET_KEY") or secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
     
     # CORS
-    CORS_ORIGINS: List[str] = [
+    CORS_ORIGINS: List[str] = field(default_factory=lambda: [
         "http://localhost",
         "http://localhost:8080",
         "http://localhost:3000",
         "https://api.vinidata.embrapa",
-    ]
+    ])
     
     # Data Sources
     VITIBRASIL_BASE_URL: str = "http://vitibrasil.cnpuv.embrapa.br/index.php"
@@ -1,4 +1,4 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -17,6 +17,14 @@ class DataResponse(BaseModel):
         default=False,
         description="Whether the data was retrieved from cache"
     )
+    layout: Literal["row", "column"] = Field(
+        default="row",
+        description="Payload layout: records in 'data' (row) or value lists per field in 'columns' (column)"
+    )
+    columns: Optional[Dict[str, List[Any]]] = Field(
+        None,
+        description="Values per field, in record order; only set when layout is 'column'"
+    )
 
 
 class ErrorResponse(BaseModel):
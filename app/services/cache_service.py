@@ -1,7 +1,7 @@
 import time
 import threading
 import logging
-from typing import Dict, Any, Optional, Callable, TypeVar, Generic
+from typing import Dict, Any, Optional, Callable, TypeVar, Generic, Hashable, Tuple
 
 from cachetools import LRUCache, TTLCache
 from app.core.config import settings
@@ -32,10 +32,12 @@ class ResilientCache(Generic[T]):
         # Historical cache for fallback (no TTL)
         self.historical_cache = LRUCache(maxsize=self.max_size * 2)
         
-        # Lock for thread safety
-        self.lock = threading.RLock()
+        # Lock for thread safety. cachetools caches mutate on reads too (TTL
+        # expiry, LRU order), so hits also need it; the critical sections are
+        # a single lookup or store and never nest, so a plain Lock is enough
+        self.lock = threading.Lock()
     
-    def get(self, key: str, fetch_func: Callable[[], T] = None) -> Optional[T]:
+    def get(self, key: Hashable, fetch_func: Callable[[], T] = None) -> Optional[T]:
         """
         Get an item from cache, with optional fetching function
         
@@ -49,9 +51,12 @@ class ResilientCache(Generic[T]):
         # Try to get from main cache first
         try:
             with self.lock:
-                if key in self.cache:
-                    logger.debug(f"Cache hit for key: {key}")
-                    return self.cache[key]
+                # A single lookup under the lock; a miss raises KeyError
+                value = self.cache[key]
+            logger.debug("Cache hit for key: %s", key)
+            return value
+        except KeyError:
+            pass
         except Exception as e:
             logger.warning(f"Error accessing cache for key {key}: {str(e)}")
         
@@ -68,16 +73,62 @@ class ResilientCache(Generic[T]):
         # If main cache failed and fetch also failed, try historical cache
         try:
             with self.lock:
-                if key in self.historical_cache:
-                    logger.warning(f"Using historical data for key: {key}")
-                    return self.historical_cache[key]
+                value = self.historical_cache[key]
+            logger.warning(f"Using historical data for key: {key}")
+            return value
         except Exception:
             pass
         
         # Nothing worked
         return None
     
-    def set(self, key: str, value: T) -> None:
+    def get_with_status(self, key: Hashable, fetch_func: Callable[[], Optional[T]] = None) -> Tuple[Optional[T], bool]:
+        """
+        Get an item from cache and tell whether it came from the cache
+        
+        Unlike get, a fetch_func result of None counts as a failed fetch: it is
+        not cached and the historical cache is tried instead.
+        
+        Args:
+            key: Cache key
+            fetch_func: Optional function to fetch data if not in cache
+            
+        Returns:
+            Tuple of (value, from_cache); from_cache is True for hits in the main
+            or historical cache, decided by the same lookup that found the value
+        """
+        try:
+            with self.lock:
+                value = self.cache[key]
+            logger.debug("Cache hit for key: %s", key)
+            return value, True
+        except KeyError:
+            pass
+        except Exception as e:
+            logger.warning(f"Error accessing cache for key {key}: {str(e)}")
+        
+        if fetch_func:
+            try:
+                logger.debug(f"Cache miss for key: {key}, fetching fresh data")
+                value = fetch_func()
+            except Exception as e:
+                logger.error(f"Error fetching fresh data for key {key}: {str(e)}")
+                value = None
+            if value is not None:
+                self.set(key, value)
+                return value, False
+        
+        try:
+            with self.lock:
+                value = self.historical_cache[key]
+            logger.warning(f"Using historical data for key: {key}")
+            return value, True
+        except KeyError:
+            pass
+        
+        return None, False
+    
+    def set(self, key: Hashable, value: T) -> None:
         """
         Set a value in the cache
         
@@ -91,11 +142,11 @@ class ResilientCache(Generic[T]):
                 self.cache[key] = value
                 # Also store in historical cache for fallback
                 self.historical_cache[key] = value
-                logger.debug(f"Cached value for key: {key}")
+            logger.debug("Cached value for key: %s", key)
         except Exception as e:
             logger.error(f"Error setting cache for key {key}: {str(e)}")
     
-    def invalidate(self, key: str) -> None:
+    def invalidate(self, key: Hashable) -> None:
         """
         Invalidate a specific cache entry
         
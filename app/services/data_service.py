@@ -1,10 +1,17 @@
+import codecs
+import csv
 import logging
-from typing import Dict, List, Any, Optional, Union
+import operator
+import os
+import threading
+from typing import Dict, List, Any, Optional, Sequence, Tuple, Union
 import math
 import numpy as np
 import pandas as pd
 import re
-from bs4 import BeautifulSoup
+from cachetools import TTLCache
+import lxml.html
+from lxml import etree
 
 from app.services.scraper.adaptive_scraper import AdaptiveScraper, ScrapedData
 from app.services.cache_service import data_cache
@@ -12,6 +19,116 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Operators accepted in the (column, op, value) predicates of get_data(filters=...)
+FILTER_OPERATORS = {
+    "=": operator.eq,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda value, options: value in options,
+    "not in": lambda value, options: value not in options,
+}
+
+# Product type aliases accepted per category, mapped to their subcategory
+PRODUCT_TYPE_SUBCATEGORIES = {
+    'processamento': {
+        'vinifera': 'viniferas',
+        'viniferas': 'viniferas',
+        'americana': 'americanas',
+        'americanas': 'americanas',
+        'mesa': 'mesa',
+    },
+    'importacao': {
+        'vinho': 'vinhos',
+        'vinhos': 'vinhos',
+        'suco': 'sucos',
+        'sucos': 'sucos',
+        'espumante': 'espumantes',
+        'espumantes': 'espumantes',
+        'passa': 'passas',
+        'passas': 'passas',
+        'fresca': 'frescas',
+        'frescas': 'frescas',
+        'uvas frescas': 'frescas',
+    },
+    'exportacao': {
+        'vinho': 'vinhos',
+        'vinhos': 'vinhos',
+        'suco': 'sucos',
+        'sucos': 'sucos',
+        'espumante': 'espumantes',
+        'espumantes': 'espumantes',
+        'uva': 'uvas',
+        'uvas': 'uvas',
+    }
+}
+
+# Record fields searched by each text filter of _filter_data
+TEXT_FILTER_FIELDS = {
+    'region': ('Regiao', 'regiao', 'Região', 'região', 'Region', 'region'),
+    'product_type': ('Produto', 'produto', 'tipo', 'Tipo', 'cultivar', 'Cultivar'),
+    'channel': ('Canal', 'canal', 'Canais', 'canais'),
+    'origin': ('Origem', 'origem', 'País', 'país', 'Pais', 'pais', 'Origin', 'origin'),
+    'destination': ('Destino', 'destino', 'País', 'país', 'Pais', 'pais', 'Destination'),
+}
+
+# Value types that _sanitize_for_json returns unchanged
+_JSON_PASSTHROUGH_TYPES = frozenset({int, bool, type(None)})
+
+
+def _keyword_regex(keywords: Sequence[str]) -> "re.Pattern":
+    """
+    Compile a regex matching any of the keywords as a substring
+    
+    One C-level scan replaces a Python any() over the keywords.
+    
+    Args:
+        keywords: Literal substrings to search for
+        
+    Returns:
+        Compiled pattern
+    """
+    return re.compile("|".join(map(re.escape, keywords)))
+
+
+# Keywords in export data, per subcategory, checked in this order
+_EXPORT_SUBCATEGORY_PATTERNS = (
+    ('vinhos', _keyword_regex(("vinho", "cabernet", "merlot", "chardonnay"))),
+    ('espumantes', _keyword_regex(("espumante", "champagne", "moscatel"))),
+    ('sucos', _keyword_regex(("suco", "concentrado"))),
+    ('uvas', _keyword_regex(("uva", "fresca", "mesa"))),
+)
+
+# Column names and row contents dropped by _clean_data_for_export
+_EXPORT_DROP_COLUMN_RE = _keyword_regex(('copyright', 'livramento', 'embrapa'))
+_NAVIGATION_ROW_RE = _keyword_regex(('DOWNLOAD', 'TOPO', '« ‹ › »'))
+_METADATA_TEXT_RE = _keyword_regex(('banco de dados', 'download'))
+
+# Categories for which detect_subcategory_from_data can find a subcategory
+SUBCATEGORY_DETECTION_CATEGORIES = ('processamento', 'exportacao')
+
+# Keys removed by clean_unnecessary_headers
+_HEADER_KEYS_TO_FILTER = frozenset({
+    "Dados da Vitivinicultura Loiva Maria Ribeiro de Mello Carlos Alberto Ely Machado",
+    "Dados da Vitivinicultura",
+})
+
+# Repeated header rows: both fields hold their own column name
+_HEADER_ROW_FIELDS = (
+    ("Cultivar", "Quantidade (Kg)"),
+    ("Países", "Quantidade (Kg)"),
+)
+
+# Turns "1.234,5" into "1234.5": thousands dots removed, decimal comma to dot
+_EU_NUMBER_TABLE = str.maketrans({'.': None, ',': '.'})
+
+# Year in a source URL, and year column names of wide fallback files
+_ANO_URL_RE = re.compile(r'ano=(\d{4})')
+_YEAR_COL_RE = re.compile(r'^(19|20)\d{2}$')
+
 
 class ViniDataService:
     """
@@ -21,6 +138,22 @@ class ViniDataService:
     
     def __init__(self):
         self.scraper = AdaptiveScraper(base_url=settings.VITIBRASIL_BASE_URL)
+        
+        # Palavras-chave de cada tipo de cultivar em minúsculas, compiladas uma
+        # única vez em uma expressão por tipo
+        self._cultivar_patterns = {
+            category: [
+                (subcategory, _keyword_regex([c.lower() for c in cultivar_list]))
+                for subcategory, cultivar_list in types.items()
+            ]
+            for category, types in self.scraper.CULTIVAR_TYPE_MAPPING.items()
+        }
+        
+        # Parsed fallback files by path and modification time, shared by every
+        # request that falls back to the same file whatever its filters; an
+        # edited file gets a new key and is parsed again
+        self._fallback_cache = TTLCache(maxsize=32, ttl=settings.CACHE_TTL)
+        self._fallback_lock = threading.Lock()
         self.fallback_files = {
             'producao': 'Producao.csv',
             'processamento': {
@@ -59,6 +192,8 @@ class ViniDataService:
         channel: Optional[str] = None,
         origin: Optional[str] = None,
         destination: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
+        filters: Optional[Sequence[Tuple[str, str, Any]]] = None,
     ) -> Dict[str, Any]:
         """
         Get data with resilient caching and filtering
@@ -73,6 +208,9 @@ class ViniDataService:
             channel: Optional channel filter (for comercializacao)
             origin: Optional origin country/region (for imports)
             destination: Optional destination country/region (for exports)
+            columns: Optional projection; only these keys are kept in each record
+            filters: Optional (column, op, value) predicates applied together with
+                the other filters, before sanitization. See FILTER_OPERATORS
             
         Returns:
             Dictionary with data and metadata
@@ -81,29 +219,16 @@ class ViniDataService:
         if not subcategory and product_type:
             subcategory = self._map_product_type_to_subcategory(category, product_type)
         
-        # Create a unique cache key based on all filters
-        cache_key = f"{category}"
-        if subcategory:
-            cache_key += f"_{subcategory}"
-        cache_key += f"_{start_year}_{end_year}"
-        
-        if any([region, product_type, channel, origin, destination]):
-            filter_key = "_filters_"
-            if region:
-                filter_key += f"r{region}"
-            if product_type:
-                filter_key += f"p{product_type}"
-            if channel:
-                filter_key += f"c{channel}"
-            if origin:
-                filter_key += f"o{origin}"
-            if destination:
-                filter_key += f"d{destination}"
-            cache_key += filter_key
+        # Create a unique cache key based on all filters: a fixed-layout tuple,
+        # hashed in C, instead of a string built piece by piece. Predicate
+        # values may be lists, so the predicates enter the key through repr
+        cache_key = (
+            category, subcategory, start_year, end_year,
+            region, product_type, channel, origin, destination,
+            repr(list(filters)) if filters else None,
+            tuple(columns) if columns else None,
+        )
 
-        # Attempt to get cached data first
-        cached_data = data_cache.get(cache_key)
-        
         # Define data fetching function for cache
         def fetch_data():
             logger.info(f"Fetching fresh data for category: {category}, subcategory: {subcategory or 'all'}")
@@ -124,19 +249,33 @@ class ViniDataService:
                     logger.warning(f"Invalid data structure detected for {category}, attempting recovery")
                     recovered_data = self._attempt_data_recovery(scraped_data)
                     if recovered_data:
-                        return recovered_data.dict()
+                        return self._scraped_to_dict(recovered_data)
                     # If recovery fails, raise exception to trigger fallback
                     raise ValueError("Data validation failed and recovery was unsuccessful")
                 
-                return scraped_data.dict()
+                return self._scraped_to_dict(scraped_data)
             
             except Exception as e:
                 logger.error(f"Error scraping data: {str(e)}")
                 # Return a failed indicator to trigger fallback
                 return None
         
-        # Try to get from cache, fallback to fresh data
-        result = cached_data or fetch_data()
+        # Try to get from cache, fallback to fresh data; a single lookup tells
+        # whether the data came from the cache. Only successful online results
+        # are cached, fallback files have their own cache
+        result, from_cache = data_cache.get_with_status(cache_key, fetch_data)
+        
+        # The key covers every filter, so a cached response is served as it
+        # was stored, without filtering and sanitizing it again; the records
+        # are copied because callers add fields to them
+        if from_cache and result.get("_sanitized"):
+            return {
+                "metadata": dict(result["metadata"]),
+                "data": [dict(item) for item in result["data"]],
+                "from_cache": True,
+                "data_source": "cache",
+                "total_records": len(result["data"])
+            }
         
         # All attempts failed, try local CSV fallback
         if not result:
@@ -154,7 +293,7 @@ class ViniDataService:
             return {"error": "Data retrieval failed", "data": [], "fallback_used": True}
         
         # Store origin of the data
-        data_source = "cache" if cached_data else ("online" if not result.get("fallback_used") else "fallback_file")
+        data_source = "cache" if from_cache else ("online" if not result.get("fallback_used") else "fallback_file")
         
         # Apply filters if necessary
         filtered_data = self._filter_data(
@@ -165,12 +304,20 @@ class ViniDataService:
             product_type=product_type,
             channel=channel,
             origin=origin,
-            destination=destination
+            destination=destination,
+            filters=filters,
         )
         
+        # Os dados podem vir do cache, então os metadados são copiados antes de
+        # qualquer alteração desta consulta
+        if "metadata" in result:
+            result = {**result, "metadata": dict(result["metadata"])}
+        
         # Tenta detectar a subcategoria automaticamente se ela não foi especificada
-        # e os dados não têm uma subcategoria definida
-        if not subcategory and not result.get("metadata", {}).get("subcategory"):
+        # e os dados não têm uma subcategoria definida; as verificações baratas
+        # vêm antes, e só há detecção para as categorias que a implementam
+        if (category in SUBCATEGORY_DETECTION_CATEGORIES and not subcategory and filtered_data
+                and not result.get("metadata", {}).get("subcategory")):
             detected_subcategory = self.detect_subcategory_from_data(category, filtered_data)
             
             # Se detectamos uma subcategoria, atualiza os metadados
@@ -184,14 +331,52 @@ class ViniDataService:
         # Sanitize data for JSON serialization
         sanitized_data = self._sanitize_for_json(filtered_data)
         
+        # Apply the projection last, so row cleaning still sees every column
+        if columns:
+            sanitized_data = [
+                {key: item[key] for key in columns if key in item}
+                for item in sanitized_data
+            ]
+        
+        # Fresh online data replaces its raw entry with the finished response;
+        # fallback files have their own cache
+        if data_source == "online":
+            data_cache.set(cache_key, {
+                "metadata": dict(result.get("metadata", {})),
+                "data": [dict(item) for item in sanitized_data],
+                "_sanitized": True,
+            })
+        
         return {
             "metadata": result.get("metadata", {}),
             "data": sanitized_data,
-            "from_cache": cached_data is not None,
+            "from_cache": from_cache,
             "data_source": data_source,
             "total_records": len(sanitized_data)
         }
     
+    @staticmethod
+    def _scraped_to_dict(scraped_data: ScrapedData) -> Dict[str, Any]:
+        """
+        Convert scraped data to the dictionary cached by get_data
+        
+        Equivalent to scraped_data.dict() without raw_html, but the records are
+        kept as the scraper built them instead of being copied one by one by
+        pydantic; the scraper builds a new list for every call.
+        
+        Args:
+            scraped_data: The scraped data to convert
+            
+        Returns:
+            Dictionary with source_url, timestamp, data and metadata
+        """
+        return {
+            "source_url": scraped_data.source_url,
+            "timestamp": scraped_data.timestamp,
+            "data": scraped_data.data,
+            "metadata": dict(scraped_data.metadata),
+        }
+    
     def _validate_scraped_data(self, scraped_data: ScrapedData) -> bool:
         """
         Validate that the scraped data has the expected structure
@@ -266,26 +451,32 @@ class ViniDataService:
         Returns:
             List of dictionaries extracted from the HTML
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
         results = []
         
         # Extract year from URL if present
-        year_match = re.search(r'ano=(\d{4})', source_url)
+        year_match = _ANO_URL_RE.search(source_url)
         year = int(year_match.group(1)) if year_match else None
         
+        # Parse with lxml's C parser and walk its tree directly; an empty
+        # document has no tables
+        try:
+            document = lxml.html.fromstring(html_content)
+        except etree.ParserError:
+            return results
+        
         # Find tables
-        tables = soup.find_all('table')
+        tables = list(document.iter('table'))
         logger.info(f"Found {len(tables)} tables in HTML")
         
         for table in tables:
             # Extract headers
-            header_row = table.find('tr')
-            if not header_row:
+            rows = table.xpath('.//tr')
+            if not rows:
                 continue
                 
             headers = []
-            for th in header_row.find_all(['th', 'td']):
-                header_text = th.text.strip()
+            for th in rows[0].xpath('.//th|.//td'):
+                header_text = th.text_content().strip()
                 if header_text:
                     headers.append(header_text)
                 else:
@@ -295,19 +486,17 @@ class ViniDataService:
                 continue
                 
             # Extract data rows
-            for row in table.find_all('tr')[1:]:
-                cells = row.find_all(['td', 'th'])
+            for row in rows[1:]:
+                cells = row.xpath('.//td|.//th')
                 
                 if len(cells) == 0:
                     continue
                     
-                # Create record
-                record = {}
-                for i, cell in enumerate(cells):
-                    if i < len(headers):
-                        key = headers[i]
-                        value = cell.text.strip()
-                        record[key] = value
+                # Create record; cells beyond the headers are ignored
+                record = {
+                    headers[i]: cell.text_content().strip()
+                    for i, cell in enumerate(cells[:len(headers)])
+                }
                 
                 # Add year if we found it
                 if year and 'ano' not in record:
@@ -329,43 +518,10 @@ class ViniDataService:
         Returns:
             Mapped subcategory name or None
         """
-        mapping = {
-            'processamento': {
-                'vinifera': 'viniferas',
-                'viniferas': 'viniferas',
-                'americana': 'americanas',
-                'americanas': 'americanas',
-                'mesa': 'mesa',
-            },
-            'importacao': {
-                'vinho': 'vinhos',
-                'vinhos': 'vinhos',
-                'suco': 'sucos',
-                'sucos': 'sucos',
-                'espumante': 'espumantes',
-                'espumantes': 'espumantes',
-                'passa': 'passas',
-                'passas': 'passas',
-                'fresca': 'frescas',
-                'frescas': 'frescas',
-                'uvas frescas': 'frescas',
-            },
-            'exportacao': {
-                'vinho': 'vinhos',
-                'vinhos': 'vinhos',
-                'suco': 'sucos',
-                'sucos': 'sucos',
-                'espumante': 'espumantes',
-                'espumantes': 'espumantes',
-                'uva': 'uvas',
-                'uvas': 'uvas',
-            }
-        }
-        
-        if category in mapping and product_type.lower() in mapping[category]:
-            return mapping[category][product_type.lower()]
-        
-        return None
+        subcategories = PRODUCT_TYPE_SUBCATEGORIES.get(category)
+        if subcategories is None:
+            return None
+        return subcategories.get(product_type.lower())
     
     def detect_subcategory_from_data(self, category: str, data: List[Dict[str, Any]]) -> Optional[str]:
         """
@@ -383,22 +539,22 @@ class ViniDataService:
             
         # Para processamento, verificamos o tipo de cultivar
         if category == "processamento" and category in self.scraper.CULTIVAR_TYPE_MAPPING:
-            # Obtenha todas as cultivares nos dados
-            cultivares = []
-            for item in data:
-                if "Cultivar" in item and item["Cultivar"]:
-                    cultivares.append(item["Cultivar"])
+            # Obtenha todas as cultivares nos dados, já em minúsculas
+            cultivares = [item["Cultivar"].lower() for item in data if item.get("Cultivar")]
             
             if not cultivares:
                 return None
+            
+            # Expressões de cada tipo, compiladas na inicialização
+            tipos = self._cultivar_patterns[category]
                 
             # Contadores por tipo
-            counts = {subcategory: 0 for subcategory in self.scraper.CULTIVAR_TYPE_MAPPING[category].keys()}
+            counts = {subcategory: 0 for subcategory, _ in tipos}
             
             # Conta as ocorrências de cada tipo
             for cultivar in cultivares:
-                for subcategory, cultivar_list in self.scraper.CULTIVAR_TYPE_MAPPING[category].items():
-                    if any(c.lower() in cultivar.lower() for c in cultivar_list):
+                for subcategory, palavras in tipos:
+                    if palavras.search(cultivar):
                         counts[subcategory] += 1
             
             # Retorna o tipo com mais ocorrências, se houver algum
@@ -409,36 +565,19 @@ class ViniDataService:
         
         # Para exportação e importação, verificamos com base no nome do arquivo de fallback
         elif category in ["exportacao", "importacao"]:
-            # Vamos verificar pelo padrão de colunas nos dados
-            column_names = []
-            for item in data:
-                column_names.extend(item.keys())
-            
-            column_names = list(set(column_names))  # Remove duplicatas
-            
-            # Verificamos países/destinos que indicam exportação
-            if "Países" in column_names and category == "exportacao":
+            # Verificamos países/destinos que indicam exportação; a busca pela
+            # coluna para no primeiro registro que a tiver
+            if category == "exportacao" and any("Países" in item for item in data):
                 # Tenta identificar por caracteres distintos dos valores
                 # Verifica tipos específicos de produtos nos dados
-                all_text = ""
-                for item in data:
-                    all_text += str(item)
+                # O texto é montado e convertido para minúsculas uma única vez
+                all_text = "".join(map(str, data)).lower()
                 
-                # Verifica palavras-chave para vinhos
-                if any(keyword in all_text.lower() for keyword in ["vinho", "vinhos", "cabernet", "merlot", "chardonnay"]):
-                    return "vinhos"
-                
-                # Verifica palavras-chave para espumantes
-                if any(keyword in all_text.lower() for keyword in ["espumante", "espumantes", "champagne", "moscatel"]):
-                    return "espumantes"
-                
-                # Verifica palavras-chave para sucos
-                if any(keyword in all_text.lower() for keyword in ["suco", "sucos", "concentrado"]):
-                    return "sucos"
-                
-                # Verifica palavras-chave para uvas
-                if any(keyword in all_text.lower() for keyword in ["uva", "uvas", "fresca", "frescas", "mesa"]):
-                    return "uvas"
+                # Verifica as palavras-chave de cada subcategoria, na ordem:
+                # vinhos, espumantes, sucos e uvas
+                for subcategoria, palavras in _EXPORT_SUBCATEGORY_PATTERNS:
+                    if palavras.search(all_text):
+                        return subcategoria
                 
                 # Se não encontrou nenhum padrão específico, verifica o padrão de export. mais comum
                 return "vinhos"  # Fallback para a subcategoria mais comum
@@ -460,23 +599,12 @@ class ViniDataService:
             return data
         
         cleaned_data = []
-        
-        # Chaves a serem filtradas
-        keys_to_filter = [
-            "Dados da Vitivinicultura Loiva Maria Ribeiro de Mello Carlos Alberto Ely Machado",
-            "Dados da Vitivinicultura",
-        ]
-        
-        # Identificadores de linhas de cabeçalho
-        header_identifiers = [
-            {"Cultivar": "Cultivar", "Quantidade (Kg)": "Quantidade (Kg)"},
-            {"Países": "Países", "Quantidade (Kg)": "Quantidade (Kg)"},
-        ]
+        keys_to_filter = _HEADER_KEYS_TO_FILTER
         
         # Filtra os registros
         for item in data:
             # Pula itens que são cabeçalhos redundantes
-            if any(all(item.get(k) == v for k, v in header_id.items()) for header_id in header_identifiers):
+            if any(item.get(a) == a and item.get(b) == b for a, b in _HEADER_ROW_FIELDS):
                 continue
             
             # Remove chaves desnecessárias
@@ -498,7 +626,9 @@ class ViniDataService:
             subcategory: Optional subcategory
             
         Returns:
-            Dictionary with data and metadata, or None if fallback fails
+            Dictionary with data and metadata, or None if fallback fails. The
+            records are shared with later calls for the same file and must not
+            be modified
         """
         if category not in self.fallback_files:
             logger.error(f"No fallback files defined for category: {category}")
@@ -522,6 +652,43 @@ class ViniDataService:
             # Simple string file path
             file_path = self.fallback_files[category]
         
+        try:
+            cache_key = (file_path, os.stat(file_path).st_mtime_ns)
+        except OSError:
+            # Missing file: the parse below fails and nothing is cached
+            cache_key = (file_path, None)
+        
+        with self._fallback_lock:
+            data = self._fallback_cache.get(cache_key)
+        if data is None:
+            data = self._read_fallback_file(file_path)
+            if data is None:
+                return None
+            with self._fallback_lock:
+                self._fallback_cache[cache_key] = data
+        
+        return {
+            "data": data,
+            "metadata": {
+                "category": category,
+                "subcategory": subcategory,
+                "source": "fallback_file",
+                "file": file_path,
+                "record_count": len(data)
+            },
+            "fallback_used": True
+        }
+    
+    def _read_fallback_file(self, file_path: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Parse a fallback CSV file into records, trying several CSV formats
+        
+        Args:
+            file_path: Path of the CSV file
+            
+        Returns:
+            List of records, or None if the file cannot be parsed
+        """
         logger.info(f"Loading fallback data from {file_path}")
         
         try:
@@ -529,9 +696,13 @@ class ViniDataService:
             df = None
             parsing_errors = []
             
-            # Attempt 1: Standard CSV loading with auto delimiter detection
+            # Attempt 1: Standard CSV loading with auto delimiter detection. The
+            # delimiter is sniffed from the header line, as sep=None does, but
+            # the file is parsed by the C engine instead of the python one
             try:
-                df = pd.read_csv(file_path, sep=None, engine='python', encoding='utf-8')
+                with open(file_path, encoding='utf-8', newline='') as f:
+                    delimiter = csv.Sniffer().sniff(f.readline()).delimiter
+                df = pd.read_csv(file_path, sep=delimiter, encoding='utf-8', float_precision='round_trip')
             except Exception as e:
                 parsing_errors.append(f"Standard parsing failed: {str(e)}")
             
@@ -557,7 +728,7 @@ class ViniDataService:
             # Post-process the data: convert from wide to long format if needed
             # If we have years as column names (wide format), transform to long format
             year_columns = [col for col in df.columns if str(col).isdigit() or 
-                           (isinstance(col, str) and re.match(r'^(19|20)\d{2}$', col))]
+                           (isinstance(col, str) and _YEAR_COL_RE.match(col))]
             
             # If data is in wide format (years as columns)
             if len(year_columns) > 0:
@@ -600,8 +771,9 @@ class ViniDataService:
                 if col != 'ano' and df[col].dtype == object:  # Skip already numeric columns
                     # Try to convert column to numeric if it contains numbers
                     try:
-                        # Handle European number format (comma as decimal separator)
-                        numeric_col = df[col].str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+                        # Handle European number format (comma as decimal separator);
+                        # one translate drops the thousands dots and swaps the comma
+                        numeric_col = df[col].str.translate(_EU_NUMBER_TABLE)
                         numeric_col = pd.to_numeric(numeric_col, errors='coerce')
                         
                         # If most values converted successfully, apply the conversion
@@ -611,19 +783,7 @@ class ViniDataService:
                         pass
             
             # Convert to records
-            data = df.replace({np.nan: None}).to_dict('records')
-            
-            return {
-                "data": data,
-                "metadata": {
-                    "category": category,
-                    "subcategory": subcategory,
-                    "source": "fallback_file",
-                    "file": file_path,
-                    "record_count": len(data)
-                },
-                "fallback_used": True
-            }
+            return df.replace({np.nan: None}).to_dict('records')
         except Exception as e:
             logger.error(f"Error loading fallback file {file_path}: {str(e)}")
             return None
@@ -646,24 +806,34 @@ class ViniDataService:
         cleaned_data = self._clean_data_for_export(data)
         sanitized_data = []
         
-        def clean_value(value):
-            # Handle special string values
-            if isinstance(value, str):
-                # Replace empty strings or dash-only strings with None
-                if value.strip() in ('', '-'):
-                    return None
-                # Try to convert numerical strings to proper numbers
+        def clean_string(value):
+            # Replace empty strings or dash-only strings with None
+            if value.strip() in ('', '-'):
+                return None
+            # Convert numbers in European format with a decimal comma ("12,5");
+            # without a dot, the comma is always the decimal separator
+            if ',' in value and '.' not in value and value.replace(',', '').isdigit():
                 try:
-                    if ',' in value and '.' not in value:
-                        # Handle European number format
-                        cleaned_val = value.replace('.', '').replace(',', '.')
-                        if cleaned_val.replace('.', '').isdigit():
-                            if '.' in cleaned_val:
-                                return float(cleaned_val)
-                            else:
-                                return int(cleaned_val)
+                    return float(value.replace(',', '.'))
                 except ValueError:
                     pass
+            return value
+        
+        def clean_float(value):
+            # NaN is the only value that differs from itself; infinities become
+            # the largest finite JSON floats
+            if value != value:
+                return None
+            if value == math.inf:
+                return 1.7976931348623157e+308  # Max JSON float
+            if value == -math.inf:
+                return -1.7976931348623157e+308  # Min JSON float
+            return value
+        
+        def clean_value(value):
+            # Handle special string values
+            if isinstance(value, str):
+                return clean_string(value)
             
             # Handle float special values
             if isinstance(value, float):
@@ -698,9 +868,17 @@ class ViniDataService:
                 
             return value
         
-        # Clean all values in the dataset after structure cleanup
+        # Clean all values in the dataset after structure cleanup. Dispatch on
+        # the exact type: ints, booleans and None (most of the values) are kept
+        # as they are, plain strings and floats skip the generic isinstance
+        # chain, which remains for numpy scalars and nested structures
+        passthrough = _JSON_PASSTHROUGH_TYPES
+        handlers = {str: clean_string, float: clean_float}
         for item in cleaned_data:
-            sanitized_item = {k: clean_value(v) for k, v in item.items()}
+            sanitized_item = {
+                k: v if type(v) in passthrough else handlers.get(type(v), clean_value)(v)
+                for k, v in item.items()
+            }
             sanitized_data.append(sanitized_item)
             
         return sanitized_data
@@ -751,8 +929,10 @@ class ViniDataService:
                     except:
                         pass
             
-            # Export to Parquet with compression
-            df.to_parquet(file_path, index=False, compression='snappy')
+            # Export to Parquet with compression; zstd files are smaller than
+            # snappy at similar read speed, and string columns such as Produto
+            # are dictionary encoded by default
+            df.to_parquet(file_path, index=False, compression='zstd')
             logger.info(f"Successfully exported {len(df)} rows to {file_path}")
             return True
             
@@ -792,8 +972,18 @@ class ViniDataService:
                 if content_cols:
                     df = df.drop_duplicates(subset=content_cols, keep='first')
             
-            # Export to CSV
-            df.to_csv(file_path, index=False, encoding='utf-8-sig')  # Use utf-8-sig to ensure proper encoding with BOM
+            # Export to CSV with the multi-threaded Arrow writer, after the same
+            # BOM that utf-8-sig writes; mixed-type or nested columns, which the
+            # Arrow writer cannot handle, go through pandas instead
+            import pyarrow as pa
+            import pyarrow.csv as pacsv
+            try:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                with open(file_path, 'wb') as f:
+                    f.write(codecs.BOM_UTF8)
+                    pacsv.write_csv(table, f)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                df.to_csv(file_path, index=False, encoding='utf-8-sig')  # Use utf-8-sig to ensure proper encoding with BOM
             logger.info(f"Successfully exported {len(df)} rows to {file_path}")
             return True
             
@@ -819,18 +1009,15 @@ class ViniDataService:
             all_keys.update(item.keys())
             
         # Remove unnecessary columns
-        columns_to_remove = [
-            col for col in all_keys 
-            if col.startswith('column_') or 
-               'copyright' in col.lower() or 
-               'livramento' in col.lower() or
-               'embrapa' in col.lower()
-        ]
+        columns_to_remove = {
+            col for col in all_keys
+            if col.startswith('column_') or _EXPORT_DROP_COLUMN_RE.search(col.lower())
+        }
         
         # Process each data item
         for item in data:
             # Skip items that appear to be metadata or navigation
-            if any(nav in str(item.values()) for nav in ['DOWNLOAD', 'TOPO', '« ‹ › »']):
+            if _NAVIGATION_ROW_RE.search(str(item.values())):
                 continue
                 
             # Skip mostly empty rows
@@ -846,7 +1033,7 @@ class ViniDataService:
                     # Clean string values
                     if isinstance(v, str):
                         # Remove long descriptive texts that appear to be metadata
-                        if len(v) > 200 and ('banco de dados' in v.lower() or 'download' in v.lower()):
+                        if len(v) > 200 and _METADATA_TEXT_RE.search(v.lower()):
                             continue
                         # Clean up the value
                         clean_v = v.strip()
@@ -871,6 +1058,7 @@ class ViniDataService:
         channel: Optional[str] = None,
         origin: Optional[str] = None,
         destination: Optional[str] = None,
+        filters: Optional[Sequence[Tuple[str, str, Any]]] = None,
     ) -> List[Dict[str, Any]]:
         """
         Filter data based on various criteria
@@ -884,12 +1072,19 @@ class ViniDataService:
             channel: Channel to filter by (for comercializacao)
             origin: Origin country/region to filter by (for imports)
             destination: Destination country/region to filter by (for exports)
+            filters: (column, op, value) predicates; records missing the column
+                or whose value cannot be compared are dropped
             
         Returns:
             Filtered data list
         """
         if not data:
             return []
+        
+        # Nothing to filter: hand back the same list, without copying it
+        if (start_year is None and end_year is None and not filters
+                and not any((region, product_type, channel, origin, destination))):
+            return data
             
         filtered_data = data
         
@@ -926,70 +1121,57 @@ class ViniDataService:
                     
             filtered_data = year_filtered
             
-        # Filter by region if specified
-        if region:
-            region_filtered = []
-            region_lower = region.lower()
-            
-            for item in filtered_data:
-                # Check all possible region fields
-                for field in ['Regiao', 'regiao', 'Região', 'região', 'Region', 'region']:
-                    if field in item and item[field] and region_lower in str(item[field]).lower():
-                        region_filtered.append(item)
-                        break
-            filtered_data = region_filtered
-            
-        # Filter by product type if specified
-        if product_type:
-            product_filtered = []
-            product_lower = product_type.lower()
-            
-            for item in filtered_data:
-                # Check all possible product fields
-                for field in ['Produto', 'produto', 'tipo', 'Tipo', 'cultivar', 'Cultivar']:
-                    if field in item and item[field] and product_lower in str(item[field]).lower():
-                        product_filtered.append(item)
-                        break
-            filtered_data = product_filtered
-            
-        # Filter by channel (for comercializacao)
-        if channel:
-            channel_filtered = []
-            channel_lower = channel.lower()
-            
-            for item in filtered_data:
-                # Check all possible channel fields
-                for field in ['Canal', 'canal', 'Canais', 'canais']:
-                    if field in item and item[field] and channel_lower in str(item[field]).lower():
-                        channel_filtered.append(item)
-                        break
-            filtered_data = channel_filtered
-            
-        # Filter by origin (for imports)
-        if origin:
-            origin_filtered = []
-            origin_lower = origin.lower()
+        # Filter by the text criteria (region, product type, channel, origin,
+        # destination) in a single pass: each active criterion must match, as a
+        # case-insensitive substring, one of its candidate fields
+        text_filters = [
+            (needle.lower(), TEXT_FILTER_FIELDS[name])
+            for name, needle in (
+                ('region', region),
+                ('product_type', product_type),
+                ('channel', channel),  # for comercializacao
+                ('origin', origin),  # for imports
+                ('destination', destination),  # for exports
+            )
+            if needle
+        ]
+        if text_filters:
+            # Only the candidate fields that occur in the data are checked;
+            # records from one source share their fields, so usually a single
+            # field is left per criterion
+            present = set().union(*filtered_data)
+            text_filters = [
+                (needle, tuple(field for field in fields if field in present))
+                for needle, fields in text_filters
+            ]
+            if not all(fields for _, fields in text_filters):
+                # A criterion none of whose fields occur matches no record
+                filtered_data = []
+            else:
+                filtered_data = [
+                    item for item in filtered_data
+                    if all(
+                        any(item.get(field) and needle in str(item[field]).lower() for field in fields)
+                        for needle, fields in text_filters
+                    )
+                ]
             
-            for item in filtered_data:
-                # Check all possible origin fields
-                for field in ['Origem', 'origem', 'País', 'país', 'Pais', 'pais', 'Origin', 'origin']:
-                    if field in item and item[field] and origin_lower in str(item[field]).lower():
-                        origin_filtered.append(item)
-                        break
-            filtered_data = origin_filtered
-            
-        # Filter by destination (for exports)
-        if destination:
-            dest_filtered = []
-            dest_lower = destination.lower()
+        # Apply explicit (column, op, value) predicates
+        for column, op, value in filters or ():
+            compare = FILTER_OPERATORS.get(op)
+            if compare is None:
+                raise ValueError(f"Unsupported filter operator: {op}")
             
+            predicate_filtered = []
             for item in filtered_data:
-                # Check all possible destination fields
-                for field in ['Destino', 'destino', 'País', 'país', 'Pais', 'pais', 'Destination']:
-                    if field in item and item[field] and dest_lower in str(item[field]).lower():
-                        dest_filtered.append(item)
-                        break
-            filtered_data = dest_filtered
+                if column not in item:
+                    continue
+                try:
+                    if compare(item[column], value):
+                        predicate_filtered.append(item)
+                except TypeError:
+                    continue
+            filtered_data = predicate_filtered
             
         return filtered_data
 
@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 import hashlib
 import logging
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
 from typing import Dict, List, Optional, Union, Any
 
 import requests
 from bs4 import BeautifulSoup
+from cachetools import TTLCache
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from pydantic import BaseModel, Field
@@ -26,6 +30,23 @@ class AdaptiveScraper:
     # Base URL for the website
     BASE_URL = "http://vitibrasil.cnpuv.embrapa.br/index.php"
     
+    # Year pages downloaded at the same time; also the HTTP connection pool size
+    MAX_PARALLEL_PAGES = 8
+    
+    # Minimum spacing in seconds between request starts across all workers,
+    # independent of MAX_PARALLEL_PAGES. The upstream site rate-limits this
+    # client, so it keeps the one request per second of the original pause;
+    # the parallel workers only overlap the latency of each download
+    MIN_REQUEST_INTERVAL = 1.0
+    
+    # Downloaded pages of settled years (before the previous one), kept for a
+    # week; pages of recent years may still be revised and are always fetched
+    PAGE_CACHE_SIZE = 512
+    PAGE_CACHE_TTL = 7 * 24 * 3600
+    
+    # Header cells per table hashed by detect_schema_changes
+    FINGERPRINT_CELLS_PER_TABLE = 20
+    
     # Category mappings (URL parameters)
     CATEGORY_MAPPING = {
         "producao": "opt_02",
@@ -138,6 +159,17 @@ class AdaptiveScraper:
         self.error_count: Dict[str, int] = {}
         self.max_retries = 3
         
+        # Downloads in progress, shared by concurrent scrapes of the same page
+        self._in_flight: Dict[str, Future] = {}
+        self._in_flight_lock = threading.Lock()
+        
+        # Pages of settled years by URL, guarded by the in-flight lock
+        self._page_cache = TTLCache(maxsize=self.PAGE_CACHE_SIZE, ttl=self.PAGE_CACHE_TTL)
+        
+        # Shared request pacing: start time reserved for the next request
+        self._next_request_at = 0.0
+        self._rate_lock = threading.Lock()
+        
         # Set up session with retry strategy
         self.session = requests.Session()
         self.retry_strategy = Retry(
@@ -146,8 +178,18 @@ class AdaptiveScraper:
             status_forcelist=[429, 500, 502, 503, 504],
             allowed_methods=['GET', 'POST']
         )
-        self.session.mount('http://', HTTPAdapter(max_retries=self.retry_strategy))
-        self.session.mount('https://', HTTPAdapter(max_retries=self.retry_strategy))
+        adapter = HTTPAdapter(
+            max_retries=self.retry_strategy,
+            pool_maxsize=self.MAX_PARALLEL_PAGES
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
+        # Workers for the per-year downloads, reusing the session's connections
+        self._page_pool = ThreadPoolExecutor(
+            max_workers=self.MAX_PARALLEL_PAGES,
+            thread_name_prefix='vitibrasil-scraper'
+        )
         
         # Set reasonable timeout
         self.timeout = 45  # Increased from default to accommodate slow server responses
@@ -159,23 +201,40 @@ class AdaptiveScraper:
             'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7'
         })
     
-    def detect_schema_changes(self, url: str, html_content: str) -> bool:
+    def detect_schema_changes(self, url: str, html_content: str, soup: Optional[BeautifulSoup] = None) -> bool:
         """
         Detect changes in HTML structure by comparing hash with last known hash
         
+        Only a structural fingerprint of the page is hashed: the header cells
+        (th, or else the first row) of each table that holds no other table.
+        Layout tables are skipped, as their cells contain the nested data.
+        Values, timestamps and other dynamic content do not count as a schema
+        change.
+        
         Args:
             url: URL of the page
             html_content: HTML content to check
+            soup: Optional html_content already parsed, to avoid parsing it again
             
         Returns:
             bool: True if a change was detected, False otherwise
         """
-        # Extract just the main content div to avoid hash changes due to dynamic elements
-        soup = BeautifulSoup(html_content, 'html.parser')
-        main_content = soup.find('div', {'class': 'main-content'})
-        content_to_hash = (main_content.prettify() if main_content else html_content)
-        
-        current_hash = hashlib.md5(content_to_hash.encode()).hexdigest()
+        if soup is None:
+            soup = BeautifulSoup(html_content, 'html.parser')
+        
+        signatures = []
+        for table in soup.find_all('table'):
+            if table.find('table') is not None:
+                continue
+            cells = table.find_all('th', limit=self.FINGERPRINT_CELLS_PER_TABLE)
+            if not cells:
+                first_row = table.find('tr')
+                cells = first_row.find_all(['th', 'td'], recursive=False,
+                                           limit=self.FINGERPRINT_CELLS_PER_TABLE) if first_row else []
+            signatures.append('\t'.join(f'{cell.name}:{cell.get_text(strip=True)}' for cell in cells))
+        fingerprint = '|'.join(signatures)
+        
+        current_hash = hashlib.md5(fingerprint.encode()).hexdigest()
         
         if url not in self.last_known_hash:
             self.last_known_hash[url] = current_hash
@@ -210,18 +269,20 @@ class AdaptiveScraper:
                 tables.extend(container.find_all('table'))
             self.logger.info(f'Found {len(tables)} tables after searching within containers')
     
-    def extract_table_data(self, html_content: str) -> List[Dict[str, Any]]:
+    def extract_table_data(self, html_content: str, soup: Optional[BeautifulSoup] = None) -> List[Dict[str, Any]]:
         """
         Extract tabular data from HTML content
         
         Args:
             html_content: HTML content to parse
+            soup: Optional html_content already parsed, to avoid parsing it again
             
         Returns:
             List of dictionaries containing the extracted data
         """
         results = []
-        soup = BeautifulSoup(html_content, 'html.parser')
+        if soup is None:
+            soup = BeautifulSoup(html_content, 'html.parser')
         
         # Try multiple strategies to find tables
         tables = []
@@ -249,11 +310,14 @@ class AdaptiveScraper:
             table_data = []
             headers = []
             
+            # Rows of the table, collected once for the checks below and the data
+            rows = table.find_all('tr')
+            
             # Try to find the header row - sometimes it's marked with th, sometimes with special classes
             header_candidates = [
                 table.find('tr', {'class': ['header', 'heading', 'title']}),
                 table.find('thead'),
-                table.find('tr')  # Fallback to first row
+                rows[0] if rows else None  # Fallback to first row
             ]
             
             header_row = next((h for h in header_candidates if h is not None), None)
@@ -277,12 +341,12 @@ class AdaptiveScraper:
                         headers.append(f'column_{i}')
             
             # If we have <th> elements in the first row but didn't detect headers, use those
-            if not headers and table.find_all('tr')[0].find('th'):
-                headers = [th.text.strip() or f'column_{i}' for i, th in enumerate(table.find_all('tr')[0].find_all('th'))]
+            if not headers and rows[0].find('th'):
+                headers = [th.text.strip() or f'column_{i}' for i, th in enumerate(rows[0].find_all('th'))]
             
             # Extract data rows - if we found headers in the first row, skip it
-            start_index = 1 if headers and table.find_all('tr')[0] == header_row else 0
-            data_rows = table.find_all('tr')[start_index:]
+            start_index = 1 if headers and rows[0] == header_row else 0
+            data_rows = rows[start_index:]
             
             for row in data_rows:
                 cells = row.find_all(['td', 'th'])
@@ -316,6 +380,116 @@ class AdaptiveScraper:
         
         return results
     
+    def _fetch_year_page(self, year_url: str, cacheable: bool = False) -> Optional[str]:
+        """
+        Fetch the HTML page for one year, sharing in-flight downloads
+        
+        Concurrent requests with overlapping year windows need the same pages.
+        The first caller for a URL downloads it; callers arriving while that
+        download is running wait for it and reuse its result instead of
+        issuing their own request. Cacheable pages are also kept for later
+        scrapes.
+        
+        Args:
+            year_url: Full URL of the page, including the year parameter
+            cacheable: Whether the page belongs to a settled year and may be
+                served from, and stored in, the page cache
+            
+        Returns:
+            HTML content, or None if every attempt failed
+        """
+        with self._in_flight_lock:
+            if cacheable:
+                cached = self._page_cache.get(year_url)
+                if cached is not None:
+                    self.logger.debug(f'Using cached page {year_url}')
+                    return cached
+            pending = self._in_flight.get(year_url)
+            if pending is None:
+                pending = self._in_flight[year_url] = Future()
+                owner = True
+            else:
+                owner = False
+        
+        if not owner:
+            self.logger.debug(f'Reusing in-flight download of {year_url}')
+            return pending.result()
+        
+        self.logger.info(f'Scraping data with URL: {year_url}')
+        try:
+            html_content = self._download_page(year_url)
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        else:
+            pending.set_result(html_content)
+            return html_content
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[year_url]
+                # Settled pages move to the page cache in the same step, so
+                # later callers find them in one of the two; failed downloads
+                # are not kept and are retried
+                if cacheable and pending.exception() is None and pending.result() is not None:
+                    self._page_cache[year_url] = pending.result()
+    
+    def _wait_for_request_slot(self) -> None:
+        """
+        Wait until this thread may start a request
+        
+        Requests from every worker are spaced by MIN_REQUEST_INTERVAL. Each
+        caller reserves the next free start time under the lock and sleeps
+        outside it, so a downloaded page is returned right away instead of
+        holding its worker for a fixed pause.
+        """
+        with self._rate_lock:
+            now = time.monotonic()
+            start = max(now, self._next_request_at)
+            self._next_request_at = start + self.MIN_REQUEST_INTERVAL
+        
+        if start > now:
+            time.sleep(start - now)
+    
+    def _download_page(self, url: str) -> Optional[str]:
+        """
+        Download a page, retrying with backoff on request errors
+        
+        Args:
+            url: URL to download
+            
+        Returns:
+            HTML content, or None if every attempt failed
+        """
+        retries = 0
+        
+        while retries < self.max_retries:
+            try:
+                # Avoid rate limiting
+                self._wait_for_request_slot()
+                
+                response = self.session.get(url, timeout=self.timeout)
+                response.raise_for_status()
+                self.error_count[url] = 0  # Reset error count on success
+                
+                return response.text
+                
+            except requests.exceptions.RequestException as e:
+                retries += 1
+                wait_time = retries * 2  # Exponential backoff
+                self.logger.warning(f'Error scraping {url}, attempt {retries}/{self.max_retries}: {str(e)}')
+                self.logger.info(f'Waiting {wait_time} seconds before retrying')
+                time.sleep(wait_time)
+                
+                # Update error tracking
+                if url not in self.error_count:
+                    self.error_count[url] = 1
+                else:
+                    self.error_count[url] += 1
+        
+        # Log if all retries failed
+        self.logger.error(f'Failed to scrape {url} after {self.max_retries} attempts')
+        return None
+    
     def scrape_with_pagination(self, url_params: Dict[str, str], start_year: int, end_year: int) -> List[Dict[str, Any]]:
         """
         Scrape data with pagination for multiple years
@@ -331,58 +505,44 @@ class AdaptiveScraper:
         all_data = []
         raw_html_collection = {}
         
+        year_urls = []
         for year in range(start_year, end_year + 1):
             # Add year to URL parameters
             year_params = {**url_params, 'ano': str(year)}
             
             # Build query string
             query_string = '&'.join([f'{k}={v}' for k, v in year_params.items()])
-            year_url = f'{self.base_url}?{query_string}'
+            year_urls.append((year, f'{self.base_url}?{query_string}'))
+        
+        self.logger.info(f'Scraping {len(year_urls)} years from {start_year} to {end_year}')
+        
+        # Download the years in parallel; results come back in year order.
+        # Pages of years before the previous one are settled and cacheable
+        settled_before = date.today().year - 1
+        pages = self._page_pool.map(
+            self._fetch_year_page,
+            [year_url for _, year_url in year_urls],
+            [year < settled_before for year, _ in year_urls],
+        )
+        
+        for (year, year_url), html_content in zip(year_urls, pages):
+            if html_content is None:
+                continue
             
-            self.logger.info(f'Scraping data for year {year} with URL: {year_url}')
+            # Store raw HTML for potential recovery later
+            raw_html_collection[year] = html_content
             
-            # Track retries for this specific URL
-            retries = 0
-            success = False
+            # Parse the page once for the schema check and the extraction;
+            # neither changes the tree
+            soup = BeautifulSoup(html_content, 'html.parser')
+            self.detect_schema_changes(year_url, html_content, soup)
+            year_data = self.extract_table_data(html_content, soup)
             
-            while retries < self.max_retries and not success:
-                try:
-                    response = self.session.get(year_url, timeout=self.timeout)
-                    response.raise_for_status()
-                    
-                    # Store raw HTML for potential recovery later
-                    raw_html_collection[year] = response.text
-                    
-                    self.detect_schema_changes(year_url, response.text)
-                    year_data = self.extract_table_data(response.text)
-                    
-                    # Add year as metadata
-                    for item in year_data:
-                        item['ano'] = year
-                    
-                    all_data.extend(year_data)
-                    self.error_count[year_url] = 0  # Reset error count on success
-                    success = True
-                    
-                    # Avoid rate limiting
-                    time.sleep(1)
-                    
-                except requests.exceptions.RequestException as e:
-                    retries += 1
-                    wait_time = retries * 2  # Exponential backoff
-                    self.logger.warning(f'Error scraping {year_url}, attempt {retries}/{self.max_retries}: {str(e)}')
-                    self.logger.info(f'Waiting {wait_time} seconds before retrying')
-                    time.sleep(wait_time)
-                    
-                    # Update error tracking
-                    if year_url not in self.error_count:
-                        self.error_count[year_url] = 1
-                    else:
-                        self.error_count[year_url] += 1
+            # Add year as metadata
+            for item in year_data:
+                item['ano'] = year
             
-            # Log if all retries failed
-            if not success:
-                self.logger.error(f'Failed to scrape {year_url} after {self.max_retries} attempts')
+            all_data.extend(year_data)
         
         # Store raw HTML in result only if we have limited data
         if len(all_data) < 10:
@@ -471,7 +631,9 @@ class AdaptiveScraper:
         # Get sample page for recovery if needed
         sample_html = next(iter(self.raw_html.values())) if hasattr(self, 'raw_html') and self.raw_html else None
         
-        return ScrapedData(
+        # The records come straight from extract_table_data, already as dicts;
+        # skip pydantic's per-record validation and copy of the whole list
+        return ScrapedData.model_construct(
             source_url=base_url,
             timestamp=time.time(),
             data=data,
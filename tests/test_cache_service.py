@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test script to validate the ResilientCache lookups and historical fallback
+"""
+import sys
+import logging
+import threading
+from pathlib import Path
+
+# Add the project root to the path so we can import our modules
+project_root = str(Path(__file__).parent.parent.absolute())
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from app.services.cache_service import ResilientCache
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def test_hit_and_miss():
+    """Hits return the stored value, including None; misses call fetch_func once"""
+    cache = ResilientCache(max_size=10, ttl=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {"data": [1]}
+
+    assert cache.get("a") is None
+    assert cache.get("a", fetch) == {"data": [1]}
+    assert cache.get("a", fetch) == {"data": [1]}
+    assert len(calls) == 1
+
+    cache.set("none", None)
+    assert cache.get("none", fetch) is None
+    assert len(calls) == 1
+
+
+def test_historical_fallback():
+    """A failed fetch falls back to the last value seen for the key"""
+    cache = ResilientCache(max_size=10, ttl=60)
+    cache.set("a", "old")
+    cache.invalidate("a")
+
+    def failing_fetch():
+        raise RuntimeError("fonte indisponível")
+
+    assert cache.get("a", failing_fetch) == "old"
+    assert cache.get("missing", failing_fetch) is None
+
+
+def test_get_with_status():
+    """The hit flag comes from the same lookup; failed fetches are not cached"""
+    cache = ResilientCache(max_size=10, ttl=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {"data": [1]}
+
+    assert cache.get_with_status("a", fetch) == ({"data": [1]}, False)
+    assert cache.get_with_status("a", fetch) == ({"data": [1]}, True)
+    assert len(calls) == 1
+
+    # None means the fetch failed: nothing is stored and the next call retries
+    assert cache.get_with_status("b", lambda: None) == (None, False)
+    assert cache.get_with_status("b", fetch) == ({"data": [1]}, False)
+
+    # Historical values still count as cached data
+    cache.invalidate("a")
+    assert cache.get_with_status("a", lambda: None) == ({"data": [1]}, True)
+
+
+def test_concurrent_access():
+    """Concurrent gets and sets do not raise or lose keys"""
+    cache = ResilientCache(max_size=1000, ttl=60)
+    errors = []
+
+    def worker(offset):
+        try:
+            for i in range(500):
+                key = f"k{(i + offset) % 200}"
+                cache.set(key, i)
+                cache.get(key)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n * 7,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert all(cache.get(f"k{i}") is not None for i in range(200))
+
+
+if __name__ == "__main__":
+    test_hit_and_miss()
+    test_historical_fallback()
+    test_get_with_status()
+    test_concurrent_access()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test script to validate the vectorized keyword classification used by the
+comercializacao, importacao and exportacao endpoints against the original
+per-record loop
+"""
+import sys
+import logging
+import random
+from pathlib import Path
+
+import pandas as pd
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+# Add the project root to the path so we can import our modules
+project_root = str(Path(__file__).parent.parent.absolute())
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from app.api.v1.endpoints._classify import (
+    compile_keyword_patterns,
+    build_text_column,
+    classify_text_column,
+    classify_records,
+)
+from app.api.v1.endpoints.comercializacao import _volume_numerico
+from app.api.v1.endpoints.producao import _PRODUTO_CAMPOS as PRODUCAO_CAMPOS, _PRODUTO_MAPPING as PRODUCAO_MAPPING
+from app.api.v1.endpoints.processamento import _CULTIVAR_CAMPOS, _CULTIVAR_MAPPING, _CULTIVAR_PATTERNS
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+MAPPING = {
+    "vinhos": ["vinho", "tinto", "vinhos de mesa", "mesa"],
+    "espumantes": ["espumante", "brut"],
+    "uvas": ["uva", "in natura", "uva fresca"],
+}
+CAMPOS = ["Produto", "produto", "Descrição", "item"]
+
+
+def legacy_classify(data, campos, mapping):
+    """Original per-record implementation used by the endpoints"""
+    labels = []
+    for item in data:
+        item_text = ""
+        for campo in campos:
+            if campo in item and item[campo]:
+                item_text += str(item[campo]).lower() + " "
+        label = None
+        for nome, palavras_chave in mapping.items():
+            if any(palavra in item_text for palavra in palavras_chave):
+                label = nome
+                break
+        labels.append(label)
+    return labels
+
+
+def vectorized_classify(data, campos, mapping):
+    df = pd.DataFrame(data, columns=campos)
+    text = build_text_column(df, campos)
+    return list(classify_text_column(text, compile_keyword_patterns(mapping)))
+
+
+def test_matches_legacy_loop():
+    """Missing fields, falsy values, mixed case and label priority"""
+    data = [
+        {"Produto": "VINHO Tinto"},
+        {"Produto": "Espumante", "item": "uva"},           # two labels: first declared wins
+        {"Produto": "Uva BRUT"},                           # espumantes before uvas
+        {"Produto": "uva", "item": "Vinho"},                # vinhos before uvas
+        {"produto": "", "Descrição": "Uva Fresca"},        # empty string is skipped
+        {"Produto": 0, "item": "in natura"},               # zero is skipped
+        {"Produto": None, "Descrição": None},              # no text at all
+        {},                                                 # no fields
+        {"outro": "vinho"},                                 # keyword outside the fields
+        {"Produto": "Suco", "Descrição": "de mesa"},
+        {"Produto": 123, "item": "Nada"},
+    ]
+    expected = legacy_classify(data, CAMPOS, MAPPING)
+    result = vectorized_classify(data, CAMPOS, MAPPING)
+    logger.info(f"Legacy: {expected}")
+    logger.info(f"Vectorized: {result}")
+
+    assert result == expected
+    assert result[1] == "espumantes"
+    assert result[2] == "espumantes"
+    assert result[3] == "vinhos"
+    assert result[6] is None and result[7] is None and result[8] is None
+
+
+def test_randomized_against_legacy_loop():
+    """Randomized comparison over records with sparse, mixed-type fields"""
+    rng = random.Random(1234)
+    vocab = ["Vinho", "TINTO", "mesa", "Brut", "espumante", "uva", "In Natura",
+             "suco", "outro", "", None, 0, 1.5, "uva fresca", "VINHOS DE MESA"]
+    data = []
+    for _ in range(500):
+        item = {}
+        for campo in CAMPOS:
+            if rng.random() < 0.5:
+                item[campo] = rng.choice(vocab)
+        data.append(item)
+
+    assert vectorized_classify(data, CAMPOS, MAPPING) == legacy_classify(data, CAMPOS, MAPPING)
+
+
+def test_empty_input():
+    """No records yields no labels"""
+    assert vectorized_classify([], CAMPOS, MAPPING) == []
+
+
+def test_records_without_text():
+    """Records with none of the fields filled are left unlabeled"""
+    data = [{"outro": "vinho"}, {"Produto": None}, {"Produto": ""}]
+    assert vectorized_classify(data, CAMPOS, MAPPING) == [None, None, None]
+
+
+def legacy_volume(item):
+    """Original per-record Volume parsing of the canal fallback"""
+    if "Volume" not in item:
+        return 0
+    volume = item["Volume"]
+    return float(volume) if isinstance(volume, (int, float)) or (isinstance(volume, str) and volume.isdigit()) else 0
+
+
+def test_volume_matches_legacy_parsing():
+    """Numbers, digit-only strings and everything else, in mixed and typed columns"""
+    samples = [
+        [{"Volume": 20000}, {"Volume": "15000"}, {"Volume": "1.000"}, {"Volume": "12,5"},
+         {"Volume": 3.5}, {"Volume": None}, {"Volume": True}, {"Volume": "-5"}, {}, {"Volume": [1]}],
+        [{"Volume": 1}, {"Volume": 20000.5}, {}],
+        [{"Volume": True}, {"Volume": False}],
+        [{"Volume": None}, {}],
+    ]
+    for data in samples:
+        df = pd.DataFrame(data, columns=["Volume"])
+        expected = [legacy_volume(item) for item in data]
+        result = [float(v) for v in _volume_numerico(df["Volume"])]
+        logger.info(f"Legacy: {expected} / Vectorized: {result}")
+        assert result == expected
+
+
+def test_cultivar_matches_legacy_loop():
+    """Processamento: lower-cased Cultivar, first matching group wins"""
+    data = [{"Cultivar": "Cabernet Sauvignon"}, {"Cultivar": "ISABEL"}, {"Cultivar": "Itália"},
+            {"Cultivar": "Red Globe"}, {"Cultivar": "Desconhecida"}, {"Cultivar": ""},
+            {"cultivar": "Merlot"}, {}]
+    expected = []
+    for item in data:
+        cultivar = item.get("Cultivar", "").lower() if "Cultivar" in item else ""
+        label = None
+        if cultivar:
+            for nome, palavras_chave in _CULTIVAR_MAPPING.items():
+                if any(palavra in cultivar for palavra in palavras_chave):
+                    label = nome
+                    break
+        expected.append(label)
+
+    df = pd.DataFrame(data, columns=list(_CULTIVAR_CAMPOS))
+    result = list(classify_text_column(build_text_column(df, _CULTIVAR_CAMPOS), _CULTIVAR_PATTERNS))
+    logger.info(f"Legacy: {expected} / Vectorized: {result}")
+    assert result == expected
+    assert result[:4] == ["viniferas", "americanas", "mesa", "mesa"]
+
+
+def legacy_producao(item):
+    """Original per-record subcategoria rule of get_producao"""
+    item_text = ""
+    for campo in PRODUCAO_CAMPOS:
+        if campo in item and item[campo]:
+            item_text += str(item[campo]).lower() + " "
+    for nome, palavras_chave in PRODUCAO_MAPPING.items():
+        if any(palavra in item_text for palavra in palavras_chave):
+            return nome
+    if "Unidade" in item:
+        unidade = str(item["Unidade"]).lower()
+        if "kg" in unidade or "ton" in unidade:
+            return "uvas"
+        elif "l" in unidade or "litro" in unidade:
+            return "vinhos"
+    return "uvas"
+
+
+def test_producao_matches_legacy_loop():
+    """Producao endpoint labels, including the Unidade fallback"""
+    import main
+    from app.services.data_service import ViniDataService
+    from app.api.v1.endpoints._cache import clear_result_cache
+
+    rng = random.Random(42)
+    vocab = ["Vinho de mesa", "SUCO", "aguardente", "Uva Niágara", "x", "", None, 7]
+    unidades = ["kg", "Litros", "L.", "ton", "", None, "un", 3.0, "KG/l"]
+    data = []
+    for _ in range(300):
+        item = {"ano": 2020}
+        for campo in ("Produto", "Descrição", "Nome"):
+            if rng.random() < 0.4:
+                item[campo] = rng.choice(vocab)
+        if rng.random() < 0.7:
+            item["Unidade"] = rng.choice(unidades)
+        data.append(item)
+    expected = [legacy_producao(item) for item in data]
+
+    clear_result_cache()
+    client = TestClient(main.app)
+    with patch.object(ViniDataService, "get_data", return_value={"data": [dict(d) for d in data], "metadata": {}}):
+        response = client.get("/api/producao/", headers={"Authorization": "Bearer test"})
+    assert response.status_code == 200
+    assert [item["subcategoria"] for item in response.json()["data"]] == expected
+
+
+def test_default_label():
+    """Rows without a match, with or without text, get the default label"""
+    data = [{"Produto": "Vinho"}, {"Produto": "nada"}, {}]
+    df = pd.DataFrame(data, columns=CAMPOS)
+    text = build_text_column(df, CAMPOS)
+    patterns = compile_keyword_patterns(MAPPING)
+    assert list(classify_text_column(text, patterns, default="outros")) == ["vinhos", "outros", "outros"]
+
+
+def test_classify_records_matches_dataframe_path():
+    """classify_records gives the same labels as building the DataFrame by hand"""
+    rng = random.Random(7)
+    words = ["vinho", "suco", "espumante", "uva", "nada", "", None, 3]
+    data = [
+        {campo: rng.choice(words) for campo in rng.sample(CAMPOS, rng.randint(0, len(CAMPOS)))}
+        for _ in range(300)
+    ]
+    patterns = compile_keyword_patterns(MAPPING)
+    df = pd.DataFrame(data, columns=CAMPOS)
+    esperado = classify_text_column(build_text_column(df, CAMPOS), patterns, default="outros")
+    assert list(classify_records(data, CAMPOS, patterns, default="outros")) == list(esperado)
+    assert len(classify_records([], CAMPOS, patterns)) == 0
+
+
+def test_preclassified_records_skip_classification():
+    """Records that already carry subcategoria are returned without classifying"""
+    import main
+    from app.services.data_service import ViniDataService
+    from app.api.v1.endpoints._cache import clear_result_cache
+
+    data = [{"ano": 2020, "Produto": "Suco", "subcategoria": "espumantes"} for _ in range(5)]
+
+    clear_result_cache()
+    client = TestClient(main.app)
+    with patch.object(ViniDataService, "get_data", return_value={"data": [dict(d) for d in data], "metadata": {}}), \
+            patch("app.api.v1.endpoints.importacao.classify_records", side_effect=AssertionError("classified")):
+        response = client.get("/api/importacao/", headers={"Authorization": "Bearer test"})
+    assert response.status_code == 200
+    assert [item["subcategoria"] for item in response.json()["data"]] == ["espumantes"] * 5
+
+    # One record without the field is enough to classify the whole batch
+    data.append({"ano": 2020, "Produto": "Suco"})
+    clear_result_cache()
+    with patch.object(ViniDataService, "get_data", return_value={"data": [dict(d) for d in data], "metadata": {}}):
+        response = client.get("/api/importacao/", headers={"Authorization": "Bearer test"})
+    assert [item["subcategoria"] for item in response.json()["data"]] == ["espumantes"] * 5 + ["sucos"]
+
+
+if __name__ == "__main__":
+    test_matches_legacy_loop()
+    test_randomized_against_legacy_loop()
+    test_empty_input()
+    test_records_without_text()
+    test_volume_matches_legacy_parsing()
+    test_cultivar_matches_legacy_loop()
+    test_producao_matches_legacy_loop()
+    test_default_label()
+    test_classify_records_matches_dataframe_path()
+    test_preclassified_records_skip_classification()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test script to validate the caching of online responses in get_data
+"""
+import sys
+import logging
+from pathlib import Path
+from unittest import mock
+
+# Add the project root to the path so we can import our modules
+project_root = str(Path(__file__).parent.parent.absolute())
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from app.services import data_service
+from app.services.cache_service import ResilientCache
+from app.services.data_service import ViniDataService
+from app.services.scraper.adaptive_scraper import ScrapedData
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def _scraped():
+    return ScrapedData(
+        source_url="http://example.local/index.php?ano=2000",
+        timestamp=0.0,
+        data=[
+            {"Produto": "Vinho", "Quantidade": "1,5", "ano": 2000},
+            {"Produto": "Suco", "Quantidade": "-", "ano": 2000},
+        ],
+        metadata={"category": "producao"},
+    )
+
+
+def test_cached_response_is_not_sanitized_again():
+    """A cache hit returns the stored response without filtering or sanitizing"""
+    service = ViniDataService()
+    service.scraper.scrape_category = mock.Mock(return_value=_scraped())
+
+    with mock.patch.object(data_service, "data_cache", ResilientCache(max_size=10, ttl=60)), \
+            mock.patch.object(service, "_sanitize_for_json", wraps=service._sanitize_for_json) as sanitize:
+        first = service.get_data(category="producao", start_year=2000, end_year=2000)
+        second = service.get_data(category="producao", start_year=2000, end_year=2000)
+
+        # Callers may add fields to what they get without touching the cache
+        second["data"][0]["subcategoria"] = "vinhos"
+        second["metadata"]["subcategory"] = "vinhos"
+        third = service.get_data(category="producao", start_year=2000, end_year=2000)
+
+    assert service.scraper.scrape_category.call_count == 1
+    assert sanitize.call_count == 1
+    assert (first["data_source"], second["data_source"]) == ("online", "cache")
+    assert (first["from_cache"], second["from_cache"]) == (False, True)
+    assert third["data"] == first["data"] == [
+        {"Produto": "Vinho", "Quantidade": 1.5, "ano": 2000},
+        {"Produto": "Suco", "Quantidade": None, "ano": 2000},
+    ]
+    assert third["total_records"] == 2
+    assert "subcategory" not in third["metadata"]
+
+
+def test_fallback_responses_are_not_cached():
+    """Fallback data is served from its own cache, not stored in data_cache"""
+    service = ViniDataService()
+    service.scraper.scrape_category = mock.Mock(side_effect=RuntimeError("offline"))
+    cache = ResilientCache(max_size=10, ttl=60)
+
+    with mock.patch.object(data_service, "data_cache", cache):
+        result = service.get_data(category="producao", start_year=2000, end_year=2000)
+
+    assert result["data_source"] == "fallback_file"
+    assert len(cache.cache) == 0
+
+
+if __name__ == "__main__":
+    test_cached_response_is_not_sanitized_again()
+    test_fallback_responses_are_not_cached()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test script to validate the reuse of parsed fallback files between requests
+"""
+import os
+import sys
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add the project root to the path so we can import our modules
+project_root = str(Path(__file__).parent.parent.absolute())
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from app.services.data_service import ViniDataService
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def test_fallback_file_parsed_once():
+    """Requests with different filters falling back to one file parse it once"""
+    service = ViniDataService()
+    service.scraper.scrape_category = mock.Mock(side_effect=RuntimeError("offline"))
+
+    with mock.patch.object(service, "_read_fallback_file", wraps=service._read_fallback_file) as read:
+        everything = service.get_data(category="importacao", start_year=1970, end_year=2025)
+        filtered = service.get_data(category="importacao", start_year=2000, end_year=2005, origin="chi")
+        other = service.get_data(category="importacao", subcategory="sucos", start_year=1970, end_year=2025)
+
+    assert [call.args[0] for call in read.call_args_list] == ["ImpVinhos.csv", "ImpSuco.csv"]
+    assert everything["data_source"] == filtered["data_source"] == "fallback_file"
+    assert 0 < len(filtered["data"]) < len(everything["data"])
+    assert other["metadata"]["file"] == "ImpSuco.csv"
+
+
+def test_failed_parse_is_not_cached():
+    """A file that cannot be parsed is retried on the next request"""
+    service = ViniDataService()
+    service.fallback_files["producao"] = "does-not-exist.csv"
+
+    with mock.patch.object(service, "_read_fallback_file", wraps=service._read_fallback_file) as read:
+        assert service._load_fallback_data("producao") is None
+        assert service._load_fallback_data("producao") is None
+
+    assert read.call_count == 2
+
+
+def test_modified_file_is_parsed_again():
+    """Editing a fallback file invalidates its parsed copy"""
+    service = ViniDataService()
+    with tempfile.TemporaryDirectory() as tmp:
+        file_path = os.path.join(tmp, "Producao.csv")
+        shutil.copy(os.path.join(project_root, "Producao.csv"), file_path)
+        service.fallback_files["producao"] = file_path
+
+        with mock.patch.object(service, "_read_fallback_file", wraps=service._read_fallback_file) as read:
+            first = service._load_fallback_data("producao")
+            assert service._load_fallback_data("producao")["data"] is first["data"]
+            assert read.call_count == 1
+
+            stat = os.stat(file_path)
+            os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            second = service._load_fallback_data("producao")
+
+        assert read.call_count == 2
+        assert second["data"] is not first["data"]
+        assert second["data"] == first["data"]
+
+
+if __name__ == "__main__":
+    test_fallback_file_parsed_once()
+    test_failed_parse_is_not_cached()
+    test_modified_file_is_parsed_again()
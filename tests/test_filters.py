@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test script to validate the record filters of the data service
+"""
+import sys
+import logging
+from pathlib import Path
+
+# Add the project root to the path so we can import our modules
+project_root = str(Path(__file__).parent.parent.absolute())
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from app.services.data_service import vini_data_service
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def create_test_data():
+    """Records with the field variants found in the scraped and fallback data"""
+    return [
+        {"Produto": "VINHO DE MESA", "ano": 2019, "valor": 10, "Região": "Sul"},
+        {"Produto": "Suco de uva", "ano": "2020", "valor": 5, "regiao": "Nordeste"},
+        {"Produto": "Espumante", "ano": 2021, "valor": None, "Regiao": "Sul"},
+        {"Cultivar": "Isabel", "ano": "n/d", "valor": 7},
+        {"País": "Chile", "ano": None, "valor": 3},
+        {"País": "Argentina", "Ano": 2022, "valor": 12, "Origem": "América do Sul"},
+    ]
+
+
+def test_year_filter():
+    """Years out of range and unparsable year strings are dropped, missing years kept"""
+    result = vini_data_service._filter_data(create_test_data(), start_year=2020, end_year=2021)
+    logger.info(f"Year filtered: {result}")
+    assert [item.get("Produto", item.get("País")) for item in result] == ["Suco de uva", "Espumante", "Chile"]
+
+
+def test_text_filters():
+    """Region, product and origin filters match case-insensitive substrings"""
+    data = create_test_data()
+    assert len(vini_data_service._filter_data(data, region="sul")) == 2
+    assert [item["Produto"] for item in vini_data_service._filter_data(data, product_type="vinho")] == ["VINHO DE MESA"]
+    assert len(vini_data_service._filter_data(data, origin="argen")) == 1
+    assert vini_data_service._filter_data(data, channel="varejo") == []
+
+
+def test_combined_text_filters():
+    """Several text filters together keep only the records matching all of them"""
+    data = create_test_data()
+    result = vini_data_service._filter_data(data, region="sul", product_type="espumante")
+    assert [item["Produto"] for item in result] == ["Espumante"]
+    result = vini_data_service._filter_data(data, origin="am", destination="argentina")
+    assert [item["País"] for item in result] == ["Argentina"]
+    assert vini_data_service._filter_data(data, region="nordeste", product_type="vinho") == []
+
+
+def test_no_filters_returns_same_list():
+    """Without any criteria the input list itself is returned"""
+    data = create_test_data()
+    assert vini_data_service._filter_data(data) is data
+
+
+def test_predicate_filters():
+    """Explicit (column, op, value) predicates drop records missing the column"""
+    data = create_test_data()
+    result = vini_data_service._filter_data(data, filters=[("valor", ">=", 7)])
+    assert [item["valor"] for item in result] == [10, 7, 12]
+
+    result = vini_data_service._filter_data(data, filters=[("País", "in", ("Chile", "Uruguai"))])
+    assert [item["País"] for item in result] == ["Chile"]
+
+    try:
+        vini_data_service._filter_data(data, filters=[("valor", "~", 1)])
+        assert False, "unsupported operator should raise"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_year_filter()
+    test_text_filters()
+    test_combined_text_filters()
+    test_no_filters_returns_same_list()
+    test_predicate_filters()
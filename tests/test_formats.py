@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test script to validate the streamed Parquet serialization shared by the
+data endpoints
+"""
+import sys
+import io
+import logging
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+# Add the project root to the path so we can import our modules
+project_root = str(Path(__file__).parent.parent.absolute())
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from app.api.v1.endpoints._formats import iter_arrow_stream, iter_csv, iter_parquet, records_to_columns, records_to_csv, records_to_table, PARQUET_CHUNK_ROWS
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def test_streamed_parquet_round_trip():
+    """A table larger than one row group is split and reads back intact"""
+    rows = 2 * PARQUET_CHUNK_ROWS + 123
+    table = pa.table({
+        "ano": list(range(rows)),
+        "Produto": [f"produto {i % 17}" for i in range(rows)],
+    })
+
+    chunks = list(iter_parquet(table))
+    content = b"".join(chunks)
+    logger.info(f"Chunks: {len(chunks)}, bytes: {len(content)}")
+
+    parquet_file = pq.ParquetFile(io.BytesIO(content))
+    assert parquet_file.num_row_groups == 3
+    assert pq.read_table(io.BytesIO(content)).equals(table)
+
+
+def test_streamed_parquet_empty_table():
+    """An empty table still produces a valid file with its schema"""
+    table = pa.table({"ano": pa.array([], pa.int64()), "Produto": pa.array([], pa.string())})
+
+    content = b"".join(iter_parquet(table))
+    result = pq.read_table(io.BytesIO(content))
+
+    assert result.num_rows == 0
+    assert result.schema.equals(table.schema)
+
+
+def test_records_to_table_matches_pandas_schema():
+    """Same columns and types as the old DataFrame path, NaN becoming null"""
+    records = [
+        {"Produto": "Tinto", "Quantidade (L.)": 1.5, "ano": 2020},
+        {"Produto": float("nan"), "Quantidade (L.)": float("nan"), "ano": 2021, "extra": "x"},
+        {"Produto": None, "ano": 2022},
+    ]
+    table = records_to_table(records)
+    legacy = pa.Table.from_pandas(pd.DataFrame(records), preserve_index=False)
+
+    logger.info(f"Schema: {table.schema}")
+    assert table.schema.equals(legacy.schema, check_metadata=False)
+    assert table.column("Produto").to_pylist() == ["Tinto", None, None]
+    assert table.column("Quantidade (L.)").null_count == 2
+
+
+def test_records_to_table_keeps_integer_gaps_as_int64():
+    """Integer columns with missing values stay int64 instead of double"""
+    records = [{"ano": 2020, "valor": 10}, {"ano": 2021}]
+    table = records_to_table(records)
+    legacy = pa.Table.from_pandas(pd.DataFrame(records), preserve_index=False)
+
+    assert table.schema.field("valor").type == pa.int64()
+    assert legacy.schema.field("valor").type == pa.float64()
+    assert table.column("valor").to_pylist() == [10, None]
+
+
+def test_records_to_csv_matches_pandas_values():
+    """The Arrow CSV parses back to the same frame as the pandas CSV"""
+    records = [
+        {"Produto": "Vinho, tinto", "Quantidade": 10, "Valor": 1.5},
+        {"Produto": "Suco \"integral\"", "Valor": None},
+        {"Produto": "Espumante", "Quantidade": 3, "Valor": float("nan"), "Pais": "Chile"},
+    ]
+    content = records_to_csv(records)
+    assert isinstance(content, bytes)
+
+    result = pd.read_csv(io.BytesIO(content))
+    expected = pd.read_csv(io.StringIO(pd.DataFrame(records).to_csv(index=False)))
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_records_to_csv_mixed_types_fall_back_to_pandas():
+    """Columns Arrow cannot type are still exported"""
+    records = [{"Volume": "1.000"}, {"Volume": 2000}]
+    content = records_to_csv(records)
+    assert content == pd.DataFrame(records).to_csv(index=False).encode("utf-8")
+
+
+def test_arrow_stream_round_trip():
+    """The Arrow IPC stream is split in record batches and reads back intact"""
+    rows = PARQUET_CHUNK_ROWS + 10
+    table = pa.table({"ano": list(range(rows)), "Produto": ["vinho"] * rows})
+
+    reader = pa.ipc.open_stream(b"".join(iter_arrow_stream(table)))
+    batches = list(reader)
+    assert len(batches) == 2
+    assert pa.Table.from_batches(batches).equals(table)
+
+
+def test_arrow_stream_empty_table():
+    """An empty table still produces a readable stream with its schema"""
+    table = pa.table({"ano": pa.array([], pa.int64())})
+    result = pa.ipc.open_stream(b"".join(iter_arrow_stream(table))).read_all()
+    assert result.num_rows == 0
+    assert result.schema.equals(table.schema)
+
+
+def test_streamed_csv_matches_single_write():
+    """The chunked CSV has one header and the same bytes as a single write_csv"""
+    rows = PARQUET_CHUNK_ROWS + 5
+    table = pa.table({"ano": list(range(rows)), "Produto": ["vinho, tinto"] * rows})
+
+    chunks = list(iter_csv(table))
+    assert len(chunks) == 3  # header + 2 batches
+
+    buffer = pa.BufferOutputStream()
+    pacsv.write_csv(table, buffer)
+    assert b"".join(chunks) == buffer.getvalue().to_pybytes()
+
+
+def test_streamed_csv_empty_table():
+    """An empty table yields only the header"""
+    table = pa.table({"ano": pa.array([], pa.int64())})
+    assert b"".join(iter_csv(table)) == b'"ano"\n'
+
+
+def test_records_to_columns():
+    """Column layout keeps record order and fills missing keys with None"""
+    records = [{"Produto": "Vinho", "ano": 2020}, {"ano": 2021, "País": "Chile"}]
+    assert records_to_columns(records) == {
+        "Produto": ["Vinho", None],
+        "ano": [2020, 2021],
+        "País": [None, "Chile"],
+    }
+    assert records_to_columns([]) == {}
+
+
+if __name__ == "__main__":
+    test_streamed_parquet_round_trip()
+    test_streamed_parquet_empty_table()
+    test_records_to_table_matches_pandas_schema()
+    test_records_to_table_keeps_integer_gaps_as_int64()
+    test_records_to_csv_matches_pandas_values()
+    test_records_to_csv_mixed_types_fall_back_to_pandas()
+    test_arrow_stream_round_trip()
+    test_arrow_stream_empty_table()
+    test_streamed_csv_matches_single_write()
+    test_streamed_csv_empty_table()
+    test_records_to_columns()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test script to validate the per-query cache of classified endpoint results
+"""
+import sys
+import logging
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pyarrow.parquet as pq
+from fastapi.testclient import TestClient
+
+# Add the project root to the path so we can import our modules
+project_root = str(Path(__file__).parent.parent.absolute())
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from app.api.v1.endpoints._cache import cached_result, clear_result_cache
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def _result(rows):
+    return {"data": rows, "metadata": {"source": "test"}}
+
+
+def test_repeated_query_hits_cache():
+    """Same endpoint and parameters compute once, in any keyword order"""
+    clear_result_cache()
+    compute = Mock(return_value=_result([{"Produto": "Vinho", "subcategoria": "vinhos"}]))
+    first = cached_result("importacao", compute, start_year=2020, subcategoria=None)
+    second = cached_result("importacao", compute, subcategoria=None, start_year=2020)
+
+    assert compute.call_count == 1
+    assert second["data"] is first["data"]
+    compute.assert_called_once_with(start_year=2020, subcategoria=None)
+
+
+def test_cache_hit_is_reported():
+    """A cache hit reports itself as such without changing the stored result"""
+    clear_result_cache()
+    compute = Mock(return_value={**_result([{"a": 1}]), "from_cache": False, "data_source": "online"})
+    first = cached_result("producao", compute, start_year=2020)
+    second = cached_result("producao", compute, start_year=2020)
+
+    assert (first["from_cache"], first["data_source"]) == (False, "online")
+    assert (second["from_cache"], second["data_source"]) == (True, "cache")
+    third = cached_result("producao", compute, start_year=2020)
+    assert third is not second and third["from_cache"] is True
+
+
+def test_different_queries_miss_cache():
+    """Each endpoint and parameter combination is cached separately"""
+    clear_result_cache()
+    compute = Mock(return_value=_result([{"a": 1}]))
+    cached_result("importacao", compute, start_year=2020)
+    cached_result("importacao", compute, start_year=2021)
+    cached_result("exportacao", compute, start_year=2020)
+    assert compute.call_count == 3
+
+
+def test_errors_are_not_cached():
+    """Failed or empty results are computed again on the next call"""
+    clear_result_cache()
+    compute = Mock(return_value={"data": [], "metadata": {}, "error": "fonte indisponível"})
+    cached_result("exportacao", compute, start_year=2020)
+    cached_result("exportacao", compute, start_year=2020)
+    assert compute.call_count == 2
+
+
+def test_fallback_results_are_not_cached():
+    """Data from the fallback files is fetched again, so the source is retried"""
+    clear_result_cache()
+    fallback = {**_result([{"a": 1}]), "from_cache": False, "data_source": "fallback_file"}
+    compute = Mock(return_value=fallback)
+    cached_result("producao", compute, start_year=2020)
+    cached_result("producao", compute, start_year=2020)
+    compute.return_value = {**_result([{"a": 1}]), "fallback_used": True}
+    cached_result("producao", compute, start_year=2020)
+    assert compute.call_count == 3
+
+
+def test_serialized_files_are_reused():
+    """A repeated file download returns the same bytes without serializing again"""
+    import io
+    import main
+    from app.api.v1.endpoints import _formats
+    from app.services.data_service import ViniDataService
+
+    clear_result_cache()
+    client = TestClient(main.app)
+    rows = {"data": [{"Cultivar": "Merlot", "ano": 2020, "Quantidade (Kg)": 10}], "metadata": {}}
+    headers = {"Authorization": "Bearer test"}
+    with patch.object(ViniDataService, "get_data", return_value=rows):
+        first = client.get("/api/processamento/?format=parquet", headers=headers)
+        with patch.object(_formats, "records_to_table", side_effect=AssertionError("serialized again")):
+            second = client.get("/api/processamento/?format=parquet", headers=headers)
+        csv = client.get("/api/processamento/?format=csv", headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["content-disposition"] == first.headers["content-disposition"]
+    assert pq.read_table(io.BytesIO(second.content)).to_pylist()[0]["subcategoria"] == "viniferas"
+    assert csv.headers["content-type"].startswith("text/csv")
+
+
+def test_fallback_files_are_not_reused():
+    """File downloads built from fallback data are serialized on every request"""
+    import main
+    from app.api.v1.endpoints import _formats
+    from app.services.data_service import ViniDataService
+
+    clear_result_cache()
+    client = TestClient(main.app)
+    rows = {"data": [{"Cultivar": "Merlot", "ano": 2020}], "metadata": {}, "data_source": "fallback_file"}
+    headers = {"Authorization": "Bearer test"}
+    with patch.object(ViniDataService, "get_data", return_value=rows), \
+            patch.object(_formats, "records_to_table", wraps=_formats.records_to_table) as serialize:
+        first = client.get("/api/processamento/?format=parquet", headers=headers)
+        second = client.get("/api/processamento/?format=parquet", headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert serialize.call_count == 2
+
+
+if __name__ == "__main__":
+    test_repeated_query_hits_cache()
+    test_cache_hit_is_reported()
+    test_different_queries_miss_cache()
+    test_errors_are_not_cached()
+    test_fallback_results_are_not_cached()
+    test_serialized_files_are_reused()
+    test_fallback_files_are_not_reused()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test script to validate that detect_schema_changes only reacts to changes
+in the table structure
+"""
+import sys
+import logging
+from pathlib import Path
+
+# Add the project root to the path so we can import our modules
+project_root = str(Path(__file__).parent.parent.absolute())
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from app.services.scraper.adaptive_scraper import AdaptiveScraper
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+URL = "http://example.local/index.php?ano=2000"
+
+PAGE = """<html><body><p>Atualizado em {stamp}</p>
+<table class="tb_dados"><thead><tr><th>Produto</th><th>Quantidade (L.)</th></tr></thead>
+<tbody><tr><td>Vinho</td><td>{value}</td></tr></tbody></table></body></html>"""
+
+
+def test_dynamic_content_is_not_a_schema_change():
+    """New values and timestamps keep the fingerprint"""
+    scraper = AdaptiveScraper(base_url="http://example.local/index.php")
+
+    assert not scraper.detect_schema_changes(URL, PAGE.format(stamp="01/01/2024", value="10"))
+    assert not scraper.detect_schema_changes(URL, PAGE.format(stamp="02/01/2024", value="12"))
+
+
+def test_changed_headers_are_a_schema_change():
+    """Renamed or added columns change the fingerprint"""
+    scraper = AdaptiveScraper(base_url="http://example.local/index.php")
+    page = PAGE.format(stamp="01/01/2024", value="10")
+
+    assert not scraper.detect_schema_changes(URL, page)
+    assert scraper.detect_schema_changes(URL, page.replace("<th>Produto</th>", "<th>Item</th>"))
+    assert scraper.detect_schema_changes(URL, page.replace("</th></tr>", "</th><th>Valor</th></tr>"))
+
+
+def test_layout_table_values_are_not_a_schema_change():
+    """Values of a data table nested in a layout table keep the fingerprint"""
+    scraper = AdaptiveScraper(base_url="http://example.local/index.php")
+
+    def in_layout(page):
+        return page.replace('<table class="tb_dados">', '<table class="layout"><tr><td><table class="tb_dados">') \
+            .replace("</table>", "</table></td></tr></table>")
+
+    page = in_layout(PAGE.format(stamp="01/01/2024", value="100"))
+    assert not scraper.detect_schema_changes(URL, page)
+    assert not scraper.detect_schema_changes(URL, page.replace("100", "200"))
+    assert scraper.detect_schema_changes(URL, page.replace("<th>Produto</th>", "<th>Item</th>"))
+
+if __name__ == "__main__":
+    test_dynamic_content_is_not_a_schema_change()
+    test_changed_headers_are_a_schema_change()
+    test_layout_table_values_are_not_a_schema_change()
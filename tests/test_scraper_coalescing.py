@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test script to validate the parallel year downloads, the sharing of
+in-flight pages between concurrent scrapes, the page cache of settled years
+and the shared request pacing
+"""
+import sys
+import logging
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from unittest import mock
+
+# Add the project root to the path so we can import our modules
+project_root = str(Path(__file__).parent.parent.absolute())
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from app.services.scraper import adaptive_scraper
+from app.services.scraper.adaptive_scraper import AdaptiveScraper
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+_real_sleep = time.sleep
+
+PAGE = "<table><tr><th>Produto</th><th>Quantidade</th></tr><tr><td>Vinho</td><td>10</td></tr></table>"
+
+
+class _Response:
+    text = PAGE
+
+    def raise_for_status(self):
+        pass
+
+
+def test_concurrent_scrapes_share_downloads():
+    """Scrapes of the same year running at the same time download the page once"""
+    scraper = AdaptiveScraper(base_url="http://example.local/index.php")
+    release = threading.Event()
+    downloads = []
+    downloads_lock = threading.Lock()
+
+    def blocking_get(url, timeout=None):
+        with downloads_lock:
+            downloads.append(url)
+        release.wait(5)
+        return _Response()
+
+    results = []
+
+    def worker():
+        results.append(scraper.scrape_with_pagination({"opcao": "opt_02"}, 2000, 2000))
+
+    with mock.patch.object(scraper.session, "get", side_effect=blocking_get), \
+            mock.patch.object(adaptive_scraper.time, "sleep", lambda seconds: None):
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        # Let every thread reach the page before it is delivered
+        _real_sleep(0.2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    assert len(downloads) == 1, downloads
+    assert len(results) == 4
+    for data in results:
+        assert [item["ano"] for item in data] == [2000]
+        assert data[0]["Produto"] == "Vinho"
+    # Each caller gets its own records
+    assert len({id(data[0]) for data in results}) == 4
+    assert not scraper._in_flight
+
+
+def test_years_downloaded_in_parallel_keep_order():
+    """Years are downloaded concurrently but the records stay in year order"""
+    scraper = AdaptiveScraper(base_url="http://example.local/index.php")
+    active = []
+    peak = []
+    active_lock = threading.Lock()
+
+    def slow_get(url, timeout=None):
+        year = int(url.rsplit("=", 1)[1])
+        with active_lock:
+            active.append(year)
+            peak.append(len(active))
+        # Earlier years take longer, so they finish last
+        _real_sleep(0.01 * (2010 - year))
+        with active_lock:
+            active.remove(year)
+        return _Response()
+
+    with mock.patch.object(scraper.session, "get", side_effect=slow_get), \
+            mock.patch.object(adaptive_scraper.time, "sleep", lambda seconds: None):
+        data = scraper.scrape_with_pagination({"opcao": "opt_02"}, 2000, 2009)
+
+    assert [item["ano"] for item in data] == list(range(2000, 2010))
+    assert 1 < max(peak) <= AdaptiveScraper.MAX_PARALLEL_PAGES
+
+
+def test_failed_download_is_not_shared_later():
+    """A failed download returns None and a later call tries again"""
+    scraper = AdaptiveScraper(base_url="http://example.local/index.php")
+    scraper.max_retries = 1
+    calls = []
+
+    def failing_get(url, timeout=None):
+        calls.append(url)
+        raise adaptive_scraper.requests.exceptions.ConnectionError("offline")
+
+    with mock.patch.object(scraper.session, "get", side_effect=failing_get), \
+            mock.patch.object(adaptive_scraper.time, "sleep", lambda seconds: None):
+        assert scraper._fetch_year_page("http://example.local/index.php?ano=2000") is None
+        assert scraper._fetch_year_page("http://example.local/index.php?ano=2000") is None
+
+    assert len(calls) == 2
+    assert not scraper._in_flight
+
+
+def test_settled_years_are_cached():
+    """Pages of settled years are downloaded once; recent years every time"""
+    scraper = AdaptiveScraper(base_url="http://example.local/index.php")
+    current_year = date.today().year
+    downloads = []
+
+    def counting_get(url, timeout=None):
+        downloads.append(int(url.rsplit("=", 1)[1]))
+        return _Response()
+
+    with mock.patch.object(scraper.session, "get", side_effect=counting_get), \
+            mock.patch.object(adaptive_scraper.time, "sleep", lambda seconds: None):
+        first = scraper.scrape_with_pagination({"opcao": "opt_02"}, current_year - 3, current_year - 1)
+        second = scraper.scrape_with_pagination({"opcao": "opt_02"}, current_year - 3, current_year - 1)
+
+    assert sorted(downloads) == [current_year - 3, current_year - 2, current_year - 1, current_year - 1]
+    assert first == second
+    assert len(scraper._page_cache) == 2
+
+
+def test_requests_are_paced_across_workers():
+    """Request starts are spaced by MIN_REQUEST_INTERVAL, not by a pause per page"""
+    scraper = AdaptiveScraper(base_url="http://example.local/index.php")
+    sleeps = []
+
+    with mock.patch.object(adaptive_scraper.time, "monotonic", lambda: 100.0), \
+            mock.patch.object(adaptive_scraper.time, "sleep", sleeps.append):
+        for _ in range(4):
+            scraper._wait_for_request_slot()
+
+    interval = AdaptiveScraper.MIN_REQUEST_INTERVAL
+    assert sleeps == [interval, 2 * interval, 3 * interval]
+
+    # A successful download returns without sleeping afterwards
+    scraper = AdaptiveScraper(base_url="http://example.local/index.php")
+    sleeps.clear()
+    with mock.patch.object(scraper.session, "get", return_value=_Response()), \
+            mock.patch.object(adaptive_scraper.time, "sleep", sleeps.append):
+        assert scraper._download_page("http://example.local/index.php?ano=2000") == PAGE
+    assert sleeps == []
+
+
+if __name__ == "__main__":
+    test_concurrent_scrapes_share_downloads()
+    test_years_downloaded_in_parallel_keep_order()
+    test_failed_download_is_not_shared_later()
+    test_settled_years_are_cached()
+    test_requests_are_paced_across_workers()